@@ -0,0 +1,268 @@
+import argparse
+import queue
+import struct
+import threading
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, zlib is always available
+    zstandard = None
+
+from layout import FRAME_HEADER_LEN, frame_sequence
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_NAMES = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+# Segment file: blocks back to back, each a BLOCK header + compressed payload
+BLOCK = struct.Struct("<4sBBIII")   # magic, codec, flags, frame count, raw length, compressed length
+BLOCK_MAGIC = b"CCB1"
+FLAG_DELTA = 0x01
+# Index file: one INDEX record per block, appended as each block is written
+INDEX = struct.Struct("<QIIQQH2x")  # offset, compressed length, frame count, first/last time (µs), first seq
+
+HDR_LEN = FRAME_HEADER_LEN  # sync word + primary + secondary header
+
+
+def _compress(codec, data, level):
+    if codec == CODEC_ZLIB:
+        return zlib.compress(data, level)
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return data
+
+
+def _decompress(codec, data):
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def _xor(a, b):
+    return (int.from_bytes(a, "big") ^ int.from_bytes(b, "big")).to_bytes(len(a), "big")
+
+
+def encode_block(frames, timestamps, delta=True):
+    """
+    Lay out a block column by column: frame lengths, time stamps, headers,
+    then the data fields.
+
+    With delta, each header is XORed with the previous one and each time
+    stamp stored as the difference to the previous one. Housekeeping
+    headers barely change between frames, so this turns them into runs of
+    zeros that compress very well.
+    """
+    n = len(frames)
+    lengths = struct.pack(f"<{n}H", *(len(f) for f in frames))
+    if delta:
+        stamps = [timestamps[0]] + [timestamps[i] - timestamps[i - 1] for i in range(1, n)]
+        headers = [frames[0][:HDR_LEN]] + [_xor(frames[i][:HDR_LEN], frames[i - 1][:HDR_LEN])
+                                           for i in range(1, n)]
+    else:
+        stamps = timestamps
+        headers = [f[:HDR_LEN] for f in frames]
+    return (lengths + struct.pack(f"<{n}q", *stamps) + b"".join(headers) +
+            b"".join(f[HDR_LEN:] for f in frames))
+
+
+def decode_block(raw, n, delta=True):
+    """Inverse of encode_block(). Returns (timestamps, frames)."""
+    lengths = struct.unpack_from(f"<{n}H", raw, 0)
+    pos = 2 * n
+    stamps = list(struct.unpack_from(f"<{n}q", raw, pos))
+    pos += 8 * n
+    headers = []
+    for i in range(n):
+        header = raw[pos:pos + HDR_LEN]
+        if delta and i:
+            header = _xor(header, headers[-1])
+            stamps[i] += stamps[i - 1]
+        headers.append(header)
+        pos += HDR_LEN
+    frames = []
+    for header, length in zip(headers, lengths):
+        body = length - HDR_LEN
+        frames.append(header + raw[pos:pos + body])
+        pos += body
+    return stamps, frames
+
+
+class ArchiveWriter:
+    """
+    Writes frames into a compressed segment (<path>.seg) with a block index
+    (<path>.idx).
+
+    write() only appends to the current block; full blocks are compressed
+    and written by a background thread, so archiving never stalls the
+    receive loop. If the compressor falls queue_size blocks behind, further
+    blocks are dropped and counted in `dropped_blocks`/`dropped_frames`
+    rather than blocking the caller. Blocks decode independently, and the
+    index records each block's first/last time stamp and first sequence
+    count.
+    """
+
+    def __init__(self, path, block_frames=1024, codec=None, level=None, delta=True, queue_size=64):
+        if codec is None:
+            codec = "zstd" if zstandard is not None else "zlib"
+        if codec == "zstd" and zstandard is None:
+            raise ValueError("zstd compression needs the 'zstandard' package.")
+        self.codec = CODEC_NAMES[codec]
+        self.level = level if level is not None else (3 if self.codec == CODEC_ZSTD else 6)
+        self.delta = delta
+        self.block_frames = block_frames
+        self.segment = open(path + ".seg", "ab")
+        self.index = open(path + ".idx", "ab")
+        self.frames = []
+        self.timestamps = []
+        self.blocks = queue.Queue(queue_size)
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.dropped_blocks = 0
+        self.dropped_frames = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, frame, timestamp=None):
+        """
+        Args:
+            frame (bytes): Frame with sync word.
+            timestamp (int): Receive time in µs since the epoch (default: now).
+        """
+        self.frames.append(bytes(frame))
+        self.timestamps.append(int(time.time() * 1e6) if timestamp is None else int(timestamp))
+        if len(self.frames) >= self.block_frames:
+            self.flush()
+
+    def flush(self, block=False):
+        """
+        Hand the current partial block to the compression thread.
+
+        Args:
+            block (bool): Wait for room in the queue instead of dropping the
+                block when the compressor is behind (used by close()).
+        """
+        if self.frames:
+            try:
+                self.blocks.put((self.frames, self.timestamps), block=block)
+            except queue.Full:
+                self.dropped_blocks += 1
+                self.dropped_frames += len(self.frames)
+            self.frames, self.timestamps = [], []
+
+    def close(self):
+        self.flush(block=True)
+        self.blocks.put(None)
+        self._thread.join()
+        self.segment.close()
+        self.index.close()
+
+    def _run(self):
+        while True:
+            item = self.blocks.get()
+            if item is None:
+                break
+            frames, timestamps = item
+            raw = encode_block(frames, timestamps, self.delta)
+            payload = _compress(self.codec, raw, self.level)
+            offset = self.segment.tell()
+            self.segment.write(BLOCK.pack(BLOCK_MAGIC, self.codec, FLAG_DELTA if self.delta else 0,
+                                          len(frames), len(raw), len(payload)))
+            self.segment.write(payload)
+            self.segment.flush()
+            first_seq = frame_sequence(frames[0])
+            self.index.write(INDEX.pack(offset, BLOCK.size + len(payload), len(frames),
+                                        timestamps[0], timestamps[-1], first_seq))
+            self.index.flush()
+            self.raw_bytes += sum(len(f) for f in frames)
+            self.stored_bytes += BLOCK.size + len(payload)
+
+
+class ArchiveReader:
+    """Random access to a segment through its block index."""
+
+    def __init__(self, path):
+        self.path = path
+        self.refresh()
+
+    def refresh(self):
+        """Re-read the index, e.g. while a writer is still appending."""
+        with open(self.path + ".idx", "rb") as f:
+            data = f.read()
+        self.blocks = [INDEX.unpack_from(data, i) for i in range(0, len(data) - INDEX.size + 1, INDEX.size)]
+
+    def read_block(self, i):
+        """Returns (timestamps, frames) of block i."""
+        offset, size, count = self.blocks[i][:3]
+        with open(self.path + ".seg", "rb") as f:
+            f.seek(offset)
+            data = f.read(size)
+        magic, codec, flags, n, raw_len, comp_len = BLOCK.unpack_from(data)
+        if magic != BLOCK_MAGIC:
+            raise ValueError(f"Corrupt archive block {i} at offset {offset}.")
+        raw = _decompress(codec, data[BLOCK.size:BLOCK.size + comp_len])
+        return decode_block(raw, n, bool(flags & FLAG_DELTA))
+
+    def query(self, t0=None, t1=None):
+        """
+        Yield (timestamp, frame) for t0 <= timestamp <= t1 (µs), decompressing
+        only the blocks whose time range overlaps the query.
+        """
+        for i, (_, _, _, first, last, _) in enumerate(self.blocks):
+            if (t1 is not None and first > t1) or (t0 is not None and last < t0):
+                continue
+            for ts, frame in zip(*self.read_block(i)):
+                if (t0 is None or ts >= t0) and (t1 is None or ts <= t1):
+                    yield ts, frame
+
+    def query_onboard(self, t0, t1, timecode=None, margin=60.0):
+        """
+        Yield (timestamp, frame) for frames whose on-board time code falls
+        within t0..t1 (Unix seconds).
+
+        Blocks are preselected by receive time widened by `margin` seconds,
+        then the time codes of their frames are converted in one go.
+
+        Args:
+            timecode: timecode.TimeCode of the frames (default: µs counter).
+        """
+        from timecode import UNIX_US
+        timecode = timecode or UNIX_US
+        for i, (_, _, _, first, last, _) in enumerate(self.blocks):
+            if first > (t1 + margin) * 1e6 or last < (t0 - margin) * 1e6:
+                continue
+            stamps, frames = self.read_block(i)
+            onboard = timecode.to_epoch(timecode.from_frames(frames), [ts / 1e6 for ts in stamps])
+            for j in ((onboard >= t0) & (onboard <= t1)).nonzero()[0]:
+                yield stamps[j], frames[j]
+
+    def __len__(self):
+        return sum(b[2] for b in self.blocks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compress a .bin capture into an archive segment, or query one")
+    parser.add_argument("path", help="Archive path (without .seg/.idx)")
+    parser.add_argument("--import-bin", metavar="FILE", help="Append the frames of a capture file")
+    parser.add_argument("--codec", choices=CODEC_NAMES, help="Compression codec (default: zstd if available)")
+    parser.add_argument("--from", dest="t0", type=float, help="Query start (epoch seconds)")
+    parser.add_argument("--to", dest="t1", type=float, help="Query end (epoch seconds)")
+    args = parser.parse_args()
+
+    if args.import_bin:
+        from replay import load_frames
+        writer = ArchiveWriter(args.path, codec=args.codec)
+        for frame in load_frames(args.import_bin):
+            writer.write(frame)
+        writer.close()
+        print(f"{writer.raw_bytes} bytes stored in {writer.stored_bytes} bytes")
+    else:
+        reader = ArchiveReader(args.path)
+        t0 = None if args.t0 is None else int(args.t0 * 1e6)
+        t1 = None if args.t1 is None else int(args.t1 * 1e6)
+        for ts, frame in reader.query(t0, t1):
+            print(f"{ts / 1e6:.6f} {frame.hex(' ').upper()}")
@@ -0,0 +1,238 @@
+# ccsds: command line entry point for scripted use.
+#
+# Only argparse and sys are imported at start-up; every subcommand imports
+# what it needs when it runs, so an offline decode never loads pyserial,
+# NumPy or the ctypes header codec. `ccsds bench` checks the start-up time
+# against STARTUP_BUDGET_MS.
+import argparse
+import sys
+
+# Wall-clock budget for `ccsds decode` of a small file, interpreter start-up included
+STARTUP_BUDGET_MS = 100
+# Modules an offline decode must not import
+HEAVY_MODULES = ("serial", "numpy", "ctypes", "ccsds_pkg")
+
+SYNC = b"\x55\xAA"
+MIN_DATA_LENGTH = 10 + 4  # secondary header + CRC
+MAX_FRAME_LEN = 2 + 6 + 10 + 256 + 4
+
+
+def iter_frames(data):
+    """
+    Split a capture into (valid, frame) tuples.
+
+    A minimal version of CCSDS_Deframer.feed() for whole files, kept here so
+    decoding does not import ccsds_pkg (and with it ctypes).
+    """
+    from zlib import crc32
+    pos = data.find(SYNC)
+    while 0 <= pos and len(data) - pos >= 8:
+        data_length = ((data[pos + 6] << 8) | data[pos + 7]) + 1
+        end = pos + 8 + data_length
+        if data_length < MIN_DATA_LENGTH or end - pos > MAX_FRAME_LEN or end > len(data):
+            pos = data.find(SYNC, pos + 1)
+            continue
+        frame = data[pos:end]
+        yield crc32(frame[2:-4]) == int.from_bytes(frame[-4:], "big"), frame
+        pos = data.find(SYNC, end)
+
+
+def describe(frame, valid=True, channels=False):
+    """One line per frame: header fields from layout.py, optionally calibrated ADC channels."""
+    import layout
+    _, header, data, crc = layout.decode_frame(frame)
+    line = (f"APID 0x{header.apid:03X} seq {header.sequence_number:5d} "
+            f"{'TC' if header.packet_type else 'TM'} len {len(data):3d} CRC 0x{crc:08X}"
+            f"{'' if valid else ' INVALID'}")
+    if hasattr(header, "function_code"):
+        line += f" fc {header.function_code:02X} t {header.timing_info}"
+    if channels and len(data) >= 2:
+        import struct
+        from tm import CHANNELS, calibrate
+        words = struct.unpack(f">{len(data) // 2}H", data[:len(data) // 2 * 2])
+        line += "  " + " ".join(f"{CHANNELS[i % len(CHANNELS)][0]}={calibrate(i, w):.3f}"
+                                for i, w in enumerate(words))
+    return line
+
+
+def load_command(path):
+    """Encoded frame of an .sds (parsed) or .bin (raw) file."""
+    if path.endswith(".sds"):
+        import contextlib
+        import io
+        from ccsds_pkg import CCSDS_Packet
+        with contextlib.redirect_stdout(io.StringIO()):  # from_file prints while computing the CRC
+            return CCSDS_Packet.from_file(path).to_bytes()
+    with open(path, "rb") as f:
+        data = f.read()
+    return data if data.startswith(SYNC) else SYNC + data
+
+
+def receive(ser, count, timeout, channels, output=None):
+    """Print frames from `ser` until `count` frames or `timeout` seconds without data."""
+    import time
+    from ccsds_pkg import CCSDS_Deframer
+    deframer = CCSDS_Deframer()
+    received = 0
+    last = time.monotonic()
+    while not count or received < count:
+        chunk = ser.read(ser.in_waiting or 1)
+        if not chunk:
+            if timeout and time.monotonic() - last > timeout:
+                break
+            continue
+        last = time.monotonic()
+        for valid, frame in deframer.feed(chunk):
+            print(describe(frame, valid, channels))
+            if output is not None:
+                output.write(frame)
+            received += 1
+    return received
+
+
+def cmd_send(args):
+    import serial
+    frame = load_command(args.file)
+    with serial.Serial(port=args.port, baudrate=args.baud, timeout=0.1) as ser:
+        ser.write(frame)
+        print(f"Sent {len(frame)} bytes: {frame.hex(' ').upper()}")
+        if args.wait:
+            if not receive(ser, 1, args.wait, args.channels):
+                print("No response")
+                return 1
+    return 0
+
+
+def cmd_receive(args):
+    import serial
+    output = open(args.out, "ab") if args.out else None
+    try:
+        with serial.Serial(port=args.port, baudrate=args.baud, timeout=0.1) as ser:
+            receive(ser, args.count, args.timeout, args.channels, output)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if output is not None:
+            output.close()
+    return 0
+
+
+def cmd_decode(args):
+    with open(args.file, "rb") as f:
+        data = f.read()
+    if data and not data.startswith(SYNC):
+        data = SYNC + data  # tmtc.py's abc.bin is stored without its sync word
+    invalid = 0
+    for valid, frame in iter_frames(data):
+        invalid += not valid
+        if not args.quiet:
+            print(describe(frame, valid, args.channels))
+            if args.hex:
+                print("  " + frame.hex(" ").upper())
+    return 1 if invalid else 0
+
+
+def cmd_compile(args):
+    for path in args.files:
+        frame = load_command(path)
+        if args.out:
+            with open(args.out, "ab") as f:
+                f.write(frame)
+        print(f"{path}: {frame.hex(' ').upper()}")
+    return 0
+
+
+def cmd_bench(args):
+    """Measure decode start-up in fresh interpreters and check the budget."""
+    import os
+    import statistics
+    import subprocess
+    import tempfile
+    import time
+    import zlib
+    import layout
+
+    data = bytes(range(16))
+    header = layout.SECONDARY.encode(0, 0, 1, 0x123, 3, 1, 10 + len(data) + 4 - 1, 0, 0, 0, 0)
+    frame = SYNC + header + data + zlib.crc32(header + data).to_bytes(4, "big")
+    with tempfile.NamedTemporaryFile(suffix=".bin", delete=False) as f:
+        f.write(frame * 10)
+    here = os.path.dirname(os.path.abspath(__file__))
+    probe = ("import sys, ccsds_cli; ccsds_cli.main(['decode', '--quiet', sys.argv[1]]); "
+             f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    times = []
+    try:
+        for _ in range(args.runs):
+            t0 = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", probe, f.name], cwd=here, capture_output=True, text=True)
+            times.append((time.perf_counter() - t0) * 1e3)
+    finally:
+        os.unlink(f.name)
+    baseline = []
+    for _ in range(args.runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"])
+        baseline.append((time.perf_counter() - t0) * 1e3)
+
+    median = statistics.median(times)
+    heavy = out.stdout.strip()
+    print(f"decode start-up: median {median:.1f} ms, min {min(times):.1f} ms over {args.runs} runs "
+          f"(bare interpreter {statistics.median(baseline):.1f} ms), budget {STARTUP_BUDGET_MS} ms")
+    if out.returncode:
+        print(f"decode failed: {out.stderr.strip()}")
+        return 1
+    if heavy:
+        print(f"decode imported heavy modules: {heavy}")
+        return 1
+    if median > STARTUP_BUDGET_MS:
+        print("over budget")
+        return 1
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="ccsds", description="CCSDS TM/TC tool")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("send", help="Send an .sds or .bin command, optionally wait for the response")
+    p.add_argument("port", help="Serial port (e.g. COM12, /dev/ttyUSB0)")
+    p.add_argument("file", help="Command file (.sds or .bin)")
+    p.add_argument("--baud", type=int, default=115200)
+    p.add_argument("--wait", type=float, default=0.0, metavar="SECONDS", help="Wait for and print one response")
+    p.add_argument("--channels", action="store_true", help="Print calibrated ADC channels")
+    p.set_defaults(func=cmd_send)
+
+    p = sub.add_parser("receive", help="Print frames arriving on a serial port")
+    p.add_argument("port", help="Serial port")
+    p.add_argument("--baud", type=int, default=115200)
+    p.add_argument("--count", type=int, default=0, help="Stop after N frames (0 = never)")
+    p.add_argument("--timeout", type=float, default=0.0, help="Stop after N seconds without data (0 = never)")
+    p.add_argument("--out", help="Append received frames to a capture file")
+    p.add_argument("--channels", action="store_true", help="Print calibrated ADC channels")
+    p.set_defaults(func=cmd_receive)
+
+    p = sub.add_parser("decode", help="Decode a capture file offline (exit status 1 on CRC errors)")
+    p.add_argument("file", help="Capture file (.bin)")
+    p.add_argument("--hex", action="store_true", help="Also print each frame in hex")
+    p.add_argument("--channels", action="store_true", help="Print calibrated ADC channels")
+    p.add_argument("--quiet", action="store_true", help="Only check the CRCs")
+    p.set_defaults(func=cmd_decode)
+
+    p = sub.add_parser("compile", help="Encode .sds files to frames")
+    p.add_argument("files", nargs="+", help=".sds files")
+    p.add_argument("--out", help="Append the encoded frames to this .bin file")
+    p.set_defaults(func=cmd_compile)
+
+    p = sub.add_parser("bench", help="Measure start-up time against the budget")
+    p.add_argument("--runs", type=int, default=20)
+    p.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,9 @@ import re
 import time
 import socket
 
+# CRC32 used for every frame; a module global so profiler.py can time it
+_crc32 = zlib.crc32
+
 
 class CCSDS_Packet_Header(BigEndianStructure):
     PRI_HDR_LEN  = 6  #primary header length
@@ -107,7 +110,7 @@ class CCSDS_Packet:
         # Combine header and data for CRC calculation
         packet_body = header_bytes + self.data
         print(" ".join([f"{b:02X}" for b in packet_body]))    
-        crc = zlib.crc32(packet_body) & 0xFFFFFFFF
+        crc = _crc32(packet_body) & 0xFFFFFFFF
         print(f"{crc:08X}")
         return crc
 
@@ -172,7 +175,7 @@ class CCSDS_Packet:
 
         # Recalculate CRC ( exclude SYNC word and CRC32 )
         crc_cal_data = buffer[ :-4 ]
-        calculated_crc = zlib.crc32(crc_cal_data) & 0xFFFFFFFF
+        calculated_crc = _crc32(crc_cal_data) & 0xFFFFFFFF
         # Verify CRC
         if received_crc != calculated_crc:
             print(f"Invalid CRC: ExpectedReceived CRC 0x{received_crc:08X}, Calculated CRC 0x{calculated_crc:08X}.")
@@ -184,7 +187,25 @@ class CCSDS_Packet:
         
         return packet
 
+    @staticmethod
+    def from_frame(frame: bytes):
+        """
+        Quietly decode a complete frame (sync word included), e.g. one returned
+        by CCSDS_Deframer.feed() which has already checked the CRC.
+
+        Args:
+            frame (bytes): Sync word + header + data + CRC.
 
+        Returns:
+            CCSDS_Packet: The decoded packet.
+        """
+        hdr_end = CCSDS_Packet.SYNC_BYTES + sizeof(CCSDS_Packet_Header)
+        if len(frame) < hdr_end + CCSDS_Packet_Header.CRC_LEN:
+            raise ValueError("Invalid packet: Data is too short.")
+        header = CCSDS_Packet_Header.from_buffer_copy(frame[CCSDS_Packet.SYNC_BYTES:hdr_end])
+        data = bytes(frame[hdr_end:-CCSDS_Packet_Header.CRC_LEN])
+        crc = int.from_bytes(frame[-CCSDS_Packet_Header.CRC_LEN:], byteorder='big')
+        return CCSDS_Packet(header, data, crc)
 
 
 
@@ -237,8 +258,8 @@ class CCSDS_Packet:
                 raise ValueError("Invalid Packet Type: Must be 'TC' or 'TM'.")
 
         if "timing_info" in file_dic and file_dic["timing_info"] == "?":
-            # Use current UTC time in microseconds
-            file_dic["timing_info"] = int(time.time() * 1e6)
+            # Use current UTC time in microseconds, wrapped to the 48-bit field (see timecode.py)
+            file_dic["timing_info"] = int(time.time() * 1e6) & 0xFFFFFFFFFFFF
 
         if "dynamic_data_(hex)" in file_dic:
             data = bytes.fromhex(file_dic["dynamic_data_(hex)"])
@@ -275,8 +296,7 @@ class CCSDS_Packet:
         header.sequence_number = int(file_dic["sequence_number"])
         length = int(file_dic["data_length"])
         header.data_length = length
-        time = int(file_dic["timing_info"])
-        header.set_timing_info(time)
+        header.set_timing_info(int(file_dic["timing_info"]))
         header.segment_number = int(file_dic["segment_number"])
         header.function_code = int(file_dic["function_code"], 16)
         header.address_code = int(file_dic["address_code"], 16)
@@ -302,7 +322,15 @@ class CCSDS_Packet:
         self.bytes_received = 0
         self.data_length = 0
 
-    def get_packet(ser):
+    def get_packet(ser, monitor=None):
+        """
+        Receive one packet from the serial port.
+
+        Args:
+            ser: Open serial port.
+            monitor: Optional LinkQualityMonitor told about the frame and any
+                     bytes skipped while searching for the sync word.
+        """
         packet = bytearray()
         state = CCSDS_Packet.STATE_IDLE
         bytes_received = 0
@@ -327,7 +355,10 @@ class CCSDS_Packet:
                         state = CCSDS_Packet.STATE_PRIMARY_HEADER
                     else:
                         packet[0] = packet[1]
+                        del packet[1:]
                         bytes_received = 1
+                        if monitor is not None:
+                            monitor.on_resync(1)
 
             elif state == CCSDS_Packet.STATE_PRIMARY_HEADER:
                 if bytes_received == CCSDS_Packet.SYNC_BYTES + CCSDS_Packet_Header.PRI_HDR_LEN:
@@ -345,7 +376,7 @@ class CCSDS_Packet:
                                       CCSDS_Packet_Header.PRI_HDR_LEN + 
                                       data_length):
                     print(f"\nreceived {bytes_received} bytes.")
-                    crc_calculated = zlib.crc32(packet[2:-CCSDS_Packet_Header.CRC_LEN]) & 0xFFFFFFFF
+                    crc_calculated = _crc32(packet[2:-CCSDS_Packet_Header.CRC_LEN]) & 0xFFFFFFFF
                     crc_received = int.from_bytes(packet[-CCSDS_Packet_Header.CRC_LEN:], 'big')
 
                     if crc_calculated == crc_received:
@@ -354,11 +385,87 @@ class CCSDS_Packet:
                     else:
                         print(f"packet CRC: 0x{crc_received:08X}, calculated CRC: 0x{crc_calculated:08X}")
                         valid = False
+                    if monitor is not None:
+                        monitor.on_frame_bytes(valid, packet)
+
 
-        
         return valid, packet
 
 
+class CCSDS_Deframer:
+    """
+    Incremental frame extractor for a continuous byte stream.
+
+    Unlike get_packet(), which reads one frame and then waits for the line to
+    go quiet, feed() accepts arbitrary chunks and returns every complete frame
+    found so far, so it can sit behind a streaming serial read.
+    """
+    MAX_FRAME_LEN = (CCSDS_Packet.SYNC_BYTES + CCSDS_Packet_Header.PRI_HDR_LEN +
+                     CCSDS_Packet_Header.SEC_HDR_LEN + 256 + CCSDS_Packet_Header.CRC_LEN)
+
+    def __init__(self, monitor=None):
+        """
+        Args:
+            monitor: Optional LinkQualityMonitor fed with every frame and resync.
+        """
+        self.monitor = monitor
+        self.buffer = bytearray()
+        self.frames = 0
+        self.crc_errors = 0
+        self.resync_bytes = 0
+
+    def feed(self, data: bytes):
+        """
+        Append received bytes and extract complete frames.
+
+        Args:
+            data (bytes): Newly received bytes.
+
+        Returns:
+            list: (valid, frame) tuples; frame includes the sync word and CRC.
+        """
+        self.buffer.extend(data)
+        buf = self.buffer
+        out = []
+        pos = 0
+        hdr_end = CCSDS_Packet.SYNC_BYTES + CCSDS_Packet_Header.PRI_HDR_LEN
+        while len(buf) - pos >= hdr_end:
+            if buf[pos] != 0x55 or buf[pos + 1] != 0xAA:
+                nxt = buf.find(b"\x55\xAA", pos + 1)
+                if nxt < 0:
+                    # keep a trailing 0x55, it may be the first half of a sync word
+                    nxt = len(buf) - 1 if buf[-1] == 0x55 else len(buf)
+                self.resync_bytes += nxt - pos
+                if self.monitor is not None:
+                    self.monitor.on_resync(nxt - pos)
+                pos = nxt
+                continue
+            data_length = (buf[pos + 6] << 8) + buf[pos + 7] + 1
+            frame_len = hdr_end + data_length
+            if frame_len > self.MAX_FRAME_LEN or data_length < CCSDS_Packet_Header.SEC_HDR_LEN + CCSDS_Packet_Header.CRC_LEN:
+                # not a plausible header, treat the sync word as noise
+                self.resync_bytes += 1
+                if self.monitor is not None:
+                    self.monitor.on_resync(1)
+                pos += 1
+                continue
+            if len(buf) - pos < frame_len:
+                break
+            frame = bytes(buf[pos:pos + frame_len])
+            crc_calculated = _crc32(frame[2:-CCSDS_Packet_Header.CRC_LEN]) & 0xFFFFFFFF
+            crc_received = int.from_bytes(frame[-CCSDS_Packet_Header.CRC_LEN:], 'big')
+            valid = crc_calculated == crc_received
+            if not valid:
+                self.crc_errors += 1
+            self.frames += 1
+            if self.monitor is not None:
+                self.monitor.on_frame_bytes(valid, frame)
+            out.append((valid, frame))
+            pos += frame_len
+        del buf[:pos]
+        return out
+
+
 
 
 
@@ -0,0 +1,140 @@
+import ast
+import graphlib
+
+import numpy as np
+
+# Functions allowed inside derived-parameter expressions
+FUNCTIONS = {
+    "abs": np.abs, "sqrt": np.sqrt, "exp": np.exp, "log": np.log, "log10": np.log10,
+    "minimum": np.minimum, "maximum": np.maximum, "clip": np.clip, "where": np.where,
+    "pi": np.pi,
+}
+
+
+class DerivedParameter:
+    def __init__(self, name, expression, limits=None):
+        """
+        Args:
+            name (str): Channel name of the result.
+            expression (str): NumPy expression over channel names and FUNCTIONS.
+            limits (tuple): Optional (red_low, red_high[, yellow_low, yellow_high]);
+                None disables a side.
+        """
+        self.name = name
+        self.expression = expression
+        self.limits = tuple(limits) if limits is not None else None
+        if self.limits is not None and len(self.limits) not in (2, 4):
+            raise ValueError(f"{name}: limits are red_low, red_high[, yellow_low, yellow_high]")
+        tree = ast.parse(expression, mode="eval")
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Attribute):
+                raise ValueError(f"{name}: attribute access is not allowed in '{expression}'")
+            if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS):
+                raise ValueError(f"{name}: only {', '.join(sorted(FUNCTIONS))} may be called")
+        self.inputs = sorted({n.id for n in ast.walk(tree) if isinstance(n, ast.Name)} - set(FUNCTIONS))
+        self.code = compile(tree, f"<derived {name}>", "eval")
+
+
+class DerivedEngine:
+    """
+    Computed telemetry channels, e.g. p28 = v28 * i28.
+
+    Expressions are compiled once into a dependency graph. update() takes a
+    batch of new samples for some channels and re-evaluates, in dependency
+    order, only the derived parameters downstream of them; each evaluation
+    works on the whole batch with NumPy. Inputs that did not change in the
+    batch contribute their most recent value.
+    """
+
+    def __init__(self):
+        self.parameters = {}
+        self.order = []
+        self.latest = {}  # channel name -> most recent scalar value
+
+    def define(self, name, expression, limits=None):
+        parameter = DerivedParameter(name, expression, limits)
+        previous = self.parameters.get(name)
+        self.parameters[name] = parameter
+        try:
+            self._build()
+        except graphlib.CycleError as e:
+            if previous is None:
+                del self.parameters[name]
+            else:
+                self.parameters[name] = previous
+            raise ValueError(f"Circular derived parameter definition: {' -> '.join(e.args[1])}")
+
+    def _build(self):
+        graph = {name: [d for d in p.inputs] for name, p in self.parameters.items()}
+        self.order = [name for name in graphlib.TopologicalSorter(graph).static_order()
+                      if name in self.parameters]
+
+    def load(self, file_path):
+        """
+        Read definitions from a text file, one `name = expression` per line,
+        optionally followed by `; red_low, red_high[, yellow_low, yellow_high]`
+        (leave a bound empty to disable it). Lines starting with # are comments.
+        """
+        with open(file_path, "r", encoding="utf-8") as file:
+            for line in file:
+                line = line.split("#", 1)[0].strip()
+                if not line:
+                    continue
+                if "=" not in line:
+                    raise ValueError(f"Invalid derived parameter line: {line}")
+                line, _, bounds = line.partition(";")
+                name, expression = line.split("=", 1)
+                limits = None
+                if bounds.strip():
+                    try:
+                        limits = [float(b) if b.strip() else None for b in bounds.split(",")]
+                    except ValueError:
+                        raise ValueError(f"Invalid derived parameter limits: {bounds.strip()}")
+                self.define(name.strip(), expression.strip(), limits)
+
+    def limits(self):
+        """Returns {name: limit bounds} for the parameters that define any."""
+        return {name: p.limits for name, p in self.parameters.items() if p.limits is not None}
+
+    def update(self, samples):
+        """
+        Recompute derived parameters affected by a batch of samples.
+
+        Args:
+            samples (dict): channel name -> value or array of new samples.
+
+        Returns:
+            dict: derived name -> recomputed value/array, in dependency order.
+        """
+        values = dict(samples)
+        dirty = set(samples)
+        results = {}
+        for name in self.order:
+            parameter = self.parameters[name]
+            if dirty.isdisjoint(parameter.inputs):
+                continue
+            namespace = dict(FUNCTIONS)
+            for dep in parameter.inputs:
+                if dep in values:
+                    namespace[dep] = values[dep]
+                elif dep in self.latest:
+                    namespace[dep] = self.latest[dep]
+                else:
+                    break  # an input has never been seen yet
+            else:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    result = eval(parameter.code, {"__builtins__": {}}, namespace)
+                values[name] = results[name] = result
+                dirty.add(name)
+        for name, value in values.items():
+            self.latest[name] = np.asarray(value).reshape(-1)[-1] if np.size(value) else np.nan
+        return results
+
+    def extend_channels(self, channels):
+        """
+        Append derived values to a Telemetery.channels() list, so they flow
+        through the same cache, limit and storage paths as ADC channels.
+        Derived channels have no raw value and use 0.
+        """
+        derived = self.update({name: value for name, raw, value in channels})
+        return channels + [(name, 0, float(value)) for name, value in derived.items()]
@@ -1,14 +1,20 @@
 import eventlet
 eventlet.monkey_patch()  # Ensure compatibility with eventlet for async operations
 
+import argparse
+import os
 import time
 import sys
 import signal
 import serial  # PySerial for COM port
 import serial.tools.list_ports  # Import for listing available COM ports
-from flask import Flask, render_template
+from flask import Flask, Response, render_template
 from flask_socketio import SocketIO
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from metrics import REGISTRY, RateMeter
+from profiler import add_profile_arguments, profile_from_args
+
 # Flask-SocketIO Setup
 app = Flask(__name__)
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode="eventlet")
@@ -17,6 +23,20 @@ socketio = SocketIO(app, cors_allowed_origins="*", async_mode="eventlet")
 SERIAL_PORT = None
 BAUD_RATE = 9600
 ser = None  # Serial connection variable
+VERBOSE = False  # print every line received/sent (costly at high rates), set with --verbose
+
+# Pipeline health, served on /metrics and pushed as the 'stats' Socket.IO event
+serial_lines = REGISTRY.counter("serial_lines_total", "Lines received from the serial port", ("port",))
+serial_bytes = REGISTRY.counter("serial_bytes_total", "Bytes received from the serial port", ("port",))
+serial_errors = REGISTRY.counter("serial_errors_total", "Serial read/write errors", ("port",))
+serial_sent = REGISTRY.counter("serial_sent_total", "Lines written to the serial port", ("port",))
+browser_latency = REGISTRY.histogram("serial_browser_latency_seconds",
+                                     "Serial line received to the browser handling it (sampled, "
+                                     "includes the ack's way back)")
+LATENCY_SAMPLE_INTERVAL = 0.1  # stamp at most one line per interval for the browser to ack
+clients = REGISTRY.gauge("socketio_clients", "Connected browser clients")
+REGISTRY.gauge("serial_in_waiting", "Bytes waiting in the serial receive buffer",
+               function=lambda: ser.in_waiting if ser and ser.is_open else 0)
 
 def list_available_ports():
     """Returns a list of available COM ports."""
@@ -27,6 +47,18 @@ def list_available_ports():
 def index():
     return render_template("index.html")  # Serves index.html from templates/
 
+@app.route("/metrics")
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@socketio.on("connect")
+def handle_connect():
+    clients.inc()
+
+@socketio.on("disconnect")
+def handle_disconnect(*args):
+    clients.dec()
+
 @socketio.on("get_com_ports")
 def handle_get_com_ports():
     """Handles request to list available COM ports."""
@@ -53,17 +85,37 @@ def handle_select_com_port(data):
 
 def read_serial():
     """Background thread to read from the COM port and emit data to clients."""
+    next_sample = 0.0
     while True:
         if ser and ser.is_open:
             try:
-                data = ser.readline().decode("utf-8").strip()
+                line = ser.readline()
+                received = time.perf_counter()
+                data = line.decode("utf-8").strip()
                 if data:
-                    print(f"📡 Received from COM: {data}")
-                    socketio.emit("serial_data", {"data": data})  # Emit to frontend
+                    serial_lines.inc(1, SERIAL_PORT)
+                    serial_bytes.inc(len(line), SERIAL_PORT)
+                    if VERBOSE:
+                        print(f"📡 Received from COM: {data}")
+                    message = {"data": data}
+                    if received >= next_sample:
+                        # the browser echoes "t" back in serial_data_ack (see handle_serial_data_ack)
+                        message["t"] = received
+                        next_sample = received + LATENCY_SAMPLE_INTERVAL
+                    socketio.emit("serial_data", message)  # Emit to frontend
             except Exception as e:
+                serial_errors.inc(1, SERIAL_PORT)
                 print(f"❌ Serial Read Error: {e}")
         eventlet.sleep(0.1)  # Avoid CPU overload
 
+@socketio.on("serial_data_ack")
+def handle_serial_data_ack(data):
+    """Browser has handled a stamped serial_data message: record receive-to-browser latency."""
+    try:
+        browser_latency.observe(time.perf_counter() - float(data["t"]))
+    except (KeyError, TypeError, ValueError):
+        pass
+
 @socketio.on("send_to_serial")
 def handle_send_to_serial(data):
     """Handles messages from the frontend and writes them to the COM port."""
@@ -73,10 +125,20 @@ def handle_send_to_serial(data):
     if ser and ser.is_open:
         try:
             ser.write((message + "\n").encode("utf-8"))
-            print(f"📤 Sent to {SERIAL_PORT}: {message}")
+            serial_sent.inc(1, SERIAL_PORT)
+            if VERBOSE:
+                print(f"📤 Sent to {SERIAL_PORT}: {message}")
         except Exception as e:
+            serial_errors.inc(1, SERIAL_PORT)
             print(f"❌ Serial Write Error: {e}")
 
+def emit_stats(interval=1.0):
+    """Background task pushing metric values and per-second rates to the browser."""
+    meter = RateMeter(REGISTRY)
+    while True:
+        eventlet.sleep(interval)
+        socketio.emit("stats", meter.sample())
+
 # Graceful Shutdown Handler
 def handle_exit(signum, frame):
     print("\n🛑 Shutting down gracefully...")
@@ -91,6 +153,17 @@ signal.signal(signal.SIGTERM, handle_exit)  # Handle termination signals
 
 # Start background task properly
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serial <-> WebSocket bridge")
+    parser.add_argument("--verbose", action="store_true", help="Print every line received and sent")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    VERBOSE = args.verbose
+    profiler = profile_from_args(args)
+    if profiler:
+        profiler.instrument(socketio, "emit", "socketio.emit")
+        profiler.instrument_print(sys.modules[__name__])  # --verbose per-line output
+
     print("🚀 Flask WebSocket Server Starting...")
     socketio.start_background_task(read_serial)  # Start COM port reader thread
+    socketio.start_background_task(emit_stats)  # Push pipeline stats to clients
     socketio.run(app, host="0.0.0.0", port=5000, debug=True)
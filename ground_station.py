@@ -0,0 +1,219 @@
+import argparse
+import fnmatch
+import os
+import selectors
+import time
+
+from ccsds_pkg import CCSDS_Deframer
+from link_quality import LinkQualityMonitor
+
+
+class Link:
+    """One serial device with its own deframer, quality monitor and consumers."""
+
+    def __init__(self, name, ser, auto=False):
+        self.name = name
+        self.ser = ser
+        self.auto = auto  # opened by hot-plug detection, closed when the device vanishes
+        self.monitor = LinkQualityMonitor()
+        self.deframer = CCSDS_Deframer(self.monitor)
+        self.consumers = []
+        self.bytes_in = 0
+        self.opened = time.time()
+
+    def as_dict(self):
+        return {"bytes": self.bytes_in, "frames": self.deframer.frames, "crc_errors": self.deframer.crc_errors,
+                "resync_bytes": self.deframer.resync_bytes, "quality": self.monitor.report()}
+
+
+class GroundStation:
+    """
+    Serves many serial ports (or ptys) from one loop.
+
+    Reads are multiplexed with selectors (epoll on Linux) over ports opened
+    with timeout=0, so one idle or slow board never blocks the others. Each
+    link has an independent deframer and LinkQualityMonitor. Frames go to
+    the link's own consumers and to the shared ones, all called as
+    consumer(link_name, valid, frame) - the signature of LinkMerger.feed().
+
+    Ports without a selectable file descriptor (Windows COM ports) are
+    polled through in_waiting instead.
+    """
+
+    def __init__(self, baud=115200, read_size=4096):
+        self.baud = baud
+        self.read_size = read_size
+        self.selector = selectors.DefaultSelector()
+        self.links = {}   # name -> Link
+        self.polled = []  # links that cannot be registered with the selector
+        self.consumers = []
+        self.next_scan = 0.0
+
+    def subscribe(self, consumer, link=None):
+        """Deliver frames of one link, or of every link when link is None."""
+        if link is None:
+            self.consumers.append(consumer)
+        else:
+            self.links[link].consumers.append(consumer)
+
+    def add_link(self, name, ser, auto=False):
+        """Add an already opened serial-like object (read, in_waiting, fileno)."""
+        if name in self.links:
+            raise ValueError(f"Link {name} already exists.")
+        link = self.links[name] = Link(name, ser, auto)
+        try:
+            self.selector.register(ser.fileno(), selectors.EVENT_READ, link)
+        except (AttributeError, OSError, ValueError):
+            self.polled.append(link)
+        return link
+
+    def add_port(self, port, baud=None, auto=False):
+        import serial
+        ser = serial.Serial(port=port, baudrate=baud or self.baud, timeout=0)
+        print(f"🔌 Opened {port}")
+        return self.add_link(port, ser, auto)
+
+    def remove_link(self, name):
+        link = self.links.pop(name, None)
+        if link is None:
+            return
+        if link in self.polled:
+            self.polled.remove(link)
+        else:
+            self.selector.unregister(link.ser.fileno())
+        try:
+            link.ser.close()
+        except Exception:
+            pass
+        print(f"🔌 Closed {name}")
+
+    def send(self, name, data):
+        return self.links[name].ser.write(data)
+
+    def _read(self, link):
+        try:
+            chunk = link.ser.read(self.read_size)
+        except Exception as e:  # device unplugged or port reset
+            print(f"❌ {link.name}: {e}")
+            self.remove_link(link.name)
+            return
+        if not chunk:
+            return
+        link.bytes_in += len(chunk)
+        for valid, frame in link.deframer.feed(chunk):
+            for consumer in link.consumers:
+                consumer(link.name, valid, frame)
+            for consumer in self.consumers:
+                consumer(link.name, valid, frame)
+
+    def poll(self, timeout=0.1):
+        """Read whatever arrived on any link, waiting at most `timeout` seconds."""
+        if self.polled:
+            for link in list(self.polled):
+                try:
+                    waiting = link.ser.in_waiting
+                except Exception:
+                    waiting = 1  # let _read() report the error
+                if waiting:
+                    self._read(link)
+            timeout = min(timeout, 0.01)
+        if self.selector.get_map():
+            for key, _ in self.selector.select(timeout):
+                self._read(key.data)
+        else:
+            time.sleep(timeout)
+
+    def scan_ports(self, pattern):
+        """
+        Hot-plug: open new ports whose device name or description matches
+        the fnmatch pattern and drop auto-opened links whose device is gone.
+        """
+        from serial.tools import list_ports
+        present = {p.device for p in list_ports.comports()
+                   if fnmatch.fnmatch(p.device, pattern) or fnmatch.fnmatch(p.description or "", pattern)}
+        for name in [n for n, link in self.links.items() if link.auto and n not in present]:
+            self.remove_link(name)
+        for device in sorted(present - set(self.links)):
+            try:
+                self.add_port(device, auto=True)
+            except Exception as e:
+                print(f"⚠️ Cannot open {device}: {e}")
+
+    def run(self, hotplug=None, scan_interval=2.0, stats_interval=0.0):
+        """
+        Serve all links until interrupted.
+
+        Args:
+            hotplug (str): fnmatch pattern of ports to open/close automatically.
+            scan_interval (float): Seconds between hot-plug scans.
+            stats_interval (float): Print per-link statistics every N seconds (0 = never).
+        """
+        next_stats = time.monotonic() + stats_interval
+        while True:
+            now = time.monotonic()
+            if hotplug and now >= self.next_scan:
+                self.scan_ports(hotplug)
+                self.next_scan = now + scan_interval
+            if stats_interval and now >= next_stats:
+                for name, stats in self.stats().items():
+                    print(f"📊 {name}: {stats['frames']} frames, {stats['crc_errors']} CRC errors, "
+                          f"{stats['quality']['rates']}")
+                next_stats += stats_interval
+            self.poll()
+
+    def stats(self):
+        return {name: link.as_dict() for name, link in self.links.items()}
+
+    def close(self):
+        for name in list(self.links):
+            self.remove_link(name)
+        self.selector.close()
+
+
+class CaptureWriter:
+    """Shared consumer appending each link's valid frames to <dir>/<link>.bin."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, link, valid, frame):
+        if not valid:
+            return
+        f = self.files.get(link)
+        if f is None:
+            name = link.strip("/").replace("/", "_").replace("\\", "_") + ".bin"
+            f = self.files[link] = open(os.path.join(self.directory, name), "ab")
+        f.write(frame)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Receive CCSDS telemetry from many serial ports in one process")
+    parser.add_argument("ports", nargs="*", help="Serial ports or ptys to open")
+    parser.add_argument("--baud", type=int, default=115200)
+    parser.add_argument("--hotplug", metavar="PATTERN",
+                        help="Open/close ports matching PATTERN as they appear (e.g. '/dev/ttyUSB*', 'COM*')")
+    parser.add_argument("--capture", metavar="DIR", help="Write each link's frames to DIR/<port>.bin")
+    parser.add_argument("--stats", type=float, default=5.0, metavar="SECONDS", help="Statistics interval")
+    args = parser.parse_args()
+
+    station = GroundStation(baud=args.baud)
+    capture = None
+    if args.capture:
+        capture = CaptureWriter(args.capture)
+        station.subscribe(capture)
+    for port in args.ports:
+        station.add_port(port)
+    try:
+        station.run(hotplug=args.hotplug, stats_interval=args.stats)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        station.close()
+        if capture is not None:
+            capture.close()
@@ -0,0 +1,323 @@
+import collections
+import struct
+
+SYNC_BYTES = 2
+CRC_LEN = 4
+
+STRUCT_CODES = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+# Where a field sits in a header: the byte group holding it and its bits in that group
+FieldLocation = collections.namedtuple("FieldLocation", "offset size shift mask endian")
+
+
+class Field(collections.namedtuple("Field", "name bits endian")):
+    """
+    One header field.
+
+    Args:
+        name (str): Field name.
+        bits (int): Width in bits. Fields are packed MSB first, as in CCSDS.
+        endian (str): 'big' or 'little'. Little-endian fields must be whole
+            bytes and start on a byte boundary.
+    """
+    __slots__ = ()
+
+    def __new__(cls, name, bits, endian="big"):
+        return super().__new__(cls, name, bits, endian)
+
+
+class Layout:
+    """
+    A header layout compiled into specialised decode/encode functions.
+
+    The fields are split into byte-aligned groups and the whole header is
+    read with one precompiled struct; odd widths such as the 48-bit time
+    code are read as several native words and recombined, and sub-byte
+    fields are extracted with shift/mask.
+    The generated source is kept in `source` for inspection.
+    """
+
+    def __init__(self, name, fields):
+        """
+        Args:
+            name (str): Layout name, also used for the record type.
+            fields (list): Field objects in wire order.
+        """
+        self.name = name
+        self.fields = list(fields)
+        self.names = [f.name for f in self.fields]
+        self.groups = self._group(self.fields)
+        self.size = sum(g[0] for g in self.groups)
+        self.record = collections.namedtuple(name, self.names)
+        self.source = self._generate()
+        namespace = {"_record": self.record, "_struct": self._struct, "_new": tuple.__new__,
+                     "_from_bytes": int.from_bytes}
+        exec(compile(self.source, f"<layout {name}>", "exec"), namespace)
+        self.decode = namespace["decode"]
+        self.encode = namespace["encode"]
+        self._dtype = None
+
+    @staticmethod
+    def _group(fields):
+        """Returns [(size in bytes, endian, [(field, shift), ...]), ...]."""
+        groups = []
+        current, bits = [], 0
+        for field in fields:
+            if field.endian == "little" and (field.bits % 8 or bits):
+                raise ValueError(f"Little-endian field '{field.name}' must be whole bytes on a byte boundary.")
+            current.append(field)
+            bits += field.bits
+            if bits % 8 == 0:
+                shifts, remaining = [], bits
+                for f in current:
+                    remaining -= f.bits
+                    shifts.append((f, remaining))
+                groups.append((bits // 8, current[0].endian, shifts))
+                current, bits = [], 0
+        if current:
+            raise ValueError(f"Fields after '{current[0].name}' do not end on a byte boundary.")
+        return groups
+
+    @staticmethod
+    def _pieces(size):
+        """Split a big-endian group into native struct widths, most significant first."""
+        pieces = []
+        for width in (8, 4, 2, 1):
+            while size >= width:
+                pieces.append(width)
+                size -= width
+        return pieces
+
+    def _generate(self):
+        fmt = ">"
+        decode = ["def decode(buf, offset=0):"]
+        encode = [f"def encode({', '.join(self.names)}):"]
+        words, values, packed = [], [], []
+        for i, (size, endian, shifts) in enumerate(self.groups):
+            word = f"_w{i}"
+            if endian == "little":
+                fmt += f"{size}s"
+                words.append(word)
+                decode.append(f"    {word} = _from_bytes({word}, 'little')")
+            elif size in STRUCT_CODES:
+                fmt += STRUCT_CODES[size]
+                words.append(word)
+            else:
+                # e.g. a 48-bit time code is read as I + H and recombined
+                parts, shift = [], size * 8
+                for j, width in enumerate(self._pieces(size)):
+                    fmt += STRUCT_CODES[width]
+                    words.append(f"{word}_{j}")
+                    shift -= width * 8
+                    parts.append(f"({word}_{j} << {shift})" if shift else f"{word}_{j}")
+                decode.append(f"    {word} = {' | '.join(parts)}")
+            for field, shift in shifts:
+                mask = (1 << field.bits) - 1
+                expr = word if shift == 0 else f"({word} >> {shift})"
+                values.append(expr if len(shifts) == 1 else f"{expr} & 0x{mask:X}")
+
+            expr = " | ".join(f"(({f.name} & 0x{(1 << f.bits) - 1:X}) << {shift})" if shift else
+                              f"({f.name} & 0x{(1 << f.bits) - 1:X})" for f, shift in shifts)
+            if endian == "little":
+                packed.append(f"({expr}).to_bytes({size}, 'little')")
+            elif size in STRUCT_CODES:
+                packed.append(expr)
+            else:
+                encode.append(f"    {word} = {expr}")
+                shift = size * 8
+                for width in self._pieces(size):
+                    shift -= width * 8
+                    packed.append(f"({word} >> {shift}) & 0x{(1 << width * 8) - 1:X}" if shift else
+                                  f"{word} & 0x{(1 << width * 8) - 1:X}")
+        self._struct = struct.Struct(fmt)
+        decode.insert(1, f"    {', '.join(words)}, = _struct.unpack_from(buf, offset)")
+        # tuple.__new__ directly: skips the namedtuple's Python-level __new__
+        decode.append(f"    return _new(_record, ({', '.join(values)},))")
+        encode.append(f"    return _struct.pack({', '.join(packed)})")
+        return "\n".join(decode + [""] + encode) + "\n"
+
+    def locate(self, name):
+        """
+        Returns:
+            FieldLocation: Byte offset and size (in the header) of the group
+            holding the field, and the shift and mask extracting it.
+        """
+        offset = 0
+        for size, endian, shifts in self.groups:
+            for field, shift in shifts:
+                if field.name == name:
+                    return FieldLocation(offset, size, shift, (1 << field.bits) - 1, endian)
+            offset += size
+        raise KeyError(f"{self.name} has no field '{name}'.")
+
+    def reader(self, name, base=0):
+        """
+        Compile a function reading one field straight from a buffer, e.g. the
+        APID of a raw frame for routing, without decoding the whole header.
+
+        Args:
+            name (str): Field name.
+            base (int): Offset of the header in the buffer (SYNC_BYTES for a frame).
+
+        Returns:
+            callable: read(buf, pos=0) for a header at buf[pos + base].
+        """
+        loc = self.locate(name)
+        order = range(loc.size) if loc.endian == "big" else range(loc.size - 1, -1, -1)
+        parts = []
+        for i, b in enumerate(order):
+            shift = 8 * (loc.size - 1 - i)
+            parts.append(f"(buf[pos + {base + loc.offset + b}] << {shift})" if shift else
+                         f"buf[pos + {base + loc.offset + b}]")
+        expr = " | ".join(parts)
+        if loc.shift:
+            expr = f"(({expr}) >> {loc.shift})"
+        if loc.mask != (1 << (8 * loc.size)) - 1:
+            expr = f"({expr}) & 0x{loc.mask:X}"
+        namespace = {}
+        exec(compile(f"def read(buf, pos=0):\n    return {expr}\n", f"<layout {self.name}.{name}>", "exec"),
+             namespace)
+        return namespace["read"]
+
+    def encode_record(self, record):
+        return self.encode(*record)
+
+    def dtype(self):
+        """NumPy structured dtype of one raw header (one member per byte group)."""
+        if self._dtype is None:
+            import numpy as np
+            members = []
+            for i, (size, endian, shifts) in enumerate(self.groups):
+                name = shifts[0][0].name if len(shifts) == 1 else f"_w{i}"
+                order = ">" if endian == "big" else "<"
+                members.append((name, f"{order}u{size}") if size in STRUCT_CODES else (name, "u1", (size,)))
+            self._dtype = np.dtype(members)
+        return self._dtype
+
+    def decode_array(self, buf, count=None, offset=0, stride=None):
+        """
+        Decode many headers at once.
+
+        Args:
+            buf: Bytes-like object or uint8 array holding the headers.
+            count (int): Number of headers (default: as many as fit).
+            offset (int): Byte offset of the first header.
+            stride (int): Bytes from one header to the next (default: the
+                header size, i.e. headers back to back). Use the frame length
+                to decode the headers of fixed-length frames in place.
+
+        Returns:
+            dict: Field name -> ndarray.
+        """
+        import numpy as np
+        data = np.frombuffer(buf, dtype=np.uint8)
+        stride = stride or self.size
+        if count is None:
+            count = (len(data) - offset - self.size) // stride + 1
+        rows = np.lib.stride_tricks.as_strided(data[offset:], (count, self.size), (stride, 1))
+        headers = np.ascontiguousarray(rows).view(self.dtype()).ravel()
+        out = {}
+        for i, (size, endian, shifts) in enumerate(self.groups):
+            name = shifts[0][0].name if len(shifts) == 1 else f"_w{i}"
+            column = headers[name]
+            if size not in STRUCT_CODES:
+                order = range(size) if endian == "big" else range(size - 1, -1, -1)
+                word = np.zeros(count, dtype=np.uint64)
+                for b in order:
+                    word = (word << np.uint64(8)) | column[:, b].astype(np.uint64)
+                column = word
+            for field, shift in shifts:
+                value = column >> shift if shift else column
+                out[field.name] = value & ((1 << field.bits) - 1) if len(shifts) > 1 else value
+        return out
+
+    def __repr__(self):
+        return f"Layout({self.name!r}, {self.size} bytes)"
+
+
+PRIMARY_FIELDS = [
+    Field("version_number", 3),
+    Field("packet_type", 1),
+    Field("second_header_flag", 1),
+    Field("apid", 11),
+    Field("group_flag", 2),
+    Field("sequence_number", 14),
+    Field("data_length", 16),
+]
+
+# Primary header only (second_header_flag = 0)
+PRIMARY = Layout("PrimaryHeader", PRIMARY_FIELDS)
+
+# Primary + the secondary header of CCSDS_Packet_Header (48-bit time, segment/function/address codes)
+SECONDARY = Layout("SecondaryHeader", PRIMARY_FIELDS + [
+    Field("timing_info", 48),
+    Field("segment_number", 8),
+    Field("function_code", 8),
+    Field("address_code", 16),
+])
+
+
+# Fields read straight from raw frames (sync word included). Everything that
+# indexes into a frame uses these rather than its own byte offsets.
+FRAME_HEADER_LEN = SYNC_BYTES + SECONDARY.size  # sync word + primary + secondary header
+SEQUENCE_MODULO = PRIMARY.locate("sequence_number").mask + 1
+TIMING_OFFSET = SYNC_BYTES + SECONDARY.locate("timing_info").offset
+TIMING_LEN = SECONDARY.locate("timing_info").size
+FUNCTION_CODE_OFFSET = SYNC_BYTES + SECONDARY.locate("function_code").offset
+frame_apid = PRIMARY.reader("apid", SYNC_BYTES)
+frame_sequence = PRIMARY.reader("sequence_number", SYNC_BYTES)
+frame_function_code = SECONDARY.reader("function_code", SYNC_BYTES)
+frame_address_code = SECONDARY.reader("address_code", SYNC_BYTES)
+_frame_data_length = PRIMARY.reader("data_length", SYNC_BYTES)
+_frame_second_header_flag = PRIMARY.reader("second_header_flag", SYNC_BYTES)
+
+
+def frame_length(buf, pos=0):
+    """Total length of the frame starting at buf[pos], from its data length field."""
+    return SYNC_BYTES + PRIMARY.size + _frame_data_length(buf, pos) + 1
+
+
+class LayoutRegistry:
+    """
+    Selects the header layout per APID.
+
+    Unregistered APIDs use SECONDARY when the secondary header flag is set
+    and PRIMARY otherwise.
+    """
+
+    def __init__(self):
+        self.layouts = {}
+
+    def register(self, apid, layout):
+        self.layouts[apid] = layout
+
+    def layout_for(self, apid, second_header_flag=1):
+        layout = self.layouts.get(apid)
+        if layout is None:
+            layout = SECONDARY if second_header_flag else PRIMARY
+        return layout
+
+    def decode_frame(self, frame):
+        """
+        Decode a complete frame (sync word included) without checking its CRC.
+
+        Returns:
+            tuple: (layout, header record, data bytes, crc)
+        """
+        layout = self.layout_for(frame_apid(frame), _frame_second_header_flag(frame))
+        header = layout.decode(frame, SYNC_BYTES)
+        data = bytes(frame[SYNC_BYTES + layout.size:-CRC_LEN])
+        crc = int.from_bytes(frame[-CRC_LEN:], "big")
+        return layout, header, data, crc
+
+
+registry = LayoutRegistry()
+
+
+def register(apid, layout):
+    """Use `layout` for frames with this APID in decode_frame()."""
+    registry.register(apid, layout)
+
+
+def decode_frame(frame):
+    return registry.decode_frame(frame)
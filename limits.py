@@ -0,0 +1,169 @@
+import collections
+import threading
+
+import numpy as np
+
+from tm import CHANNELS
+
+NOMINAL = 0
+YELLOW = 1
+RED = 2
+STATE_NAMES = {NOMINAL: "nominal", YELLOW: "yellow", RED: "red"}
+
+LimitEvent = collections.namedtuple("LimitEvent", "key t value old_state new_state")
+
+
+class ChannelLimits:
+    """
+    Red/yellow limits for one channel.
+
+    Args:
+        red_low, red_high (float): Red limits (None to disable a side).
+        yellow_low, yellow_high (float): Yellow limits (None to disable a side).
+        persistence (int): Consecutive samples a new state must hold before it is reported.
+        hysteresis (float): How far back inside a limit a value must come to clear it.
+    """
+
+    def __init__(self, red_low=None, red_high=None, yellow_low=None, yellow_high=None,
+                 persistence=1, hysteresis=0.0):
+        self.red_low = red_low
+        self.red_high = red_high
+        self.yellow_low = yellow_low
+        self.yellow_high = yellow_high
+        self.persistence = max(1, persistence)
+        self.hysteresis = hysteresis
+
+
+def _latch(on, off, prev):
+    """
+    Vectorized hysteresis: the flag is set where `on`, cleared where `off`
+    and otherwise keeps its previous value (carried in from `prev`).
+    """
+    pos = np.arange(len(on))
+    last = np.maximum.accumulate(np.where(on | off, pos, -1))
+    return np.where(last >= 0, on[np.maximum(last, 0)], prev)
+
+
+class _ChannelState:
+    def __init__(self, limits):
+        self.limits = limits
+        self.flags = {"red_low": False, "red_high": False, "yellow_low": False, "yellow_high": False}
+        self.level = NOMINAL      # raw (un-persisted) level of the last sample
+        self.run = 0              # how many samples `level` has held
+        self.reported = NOMINAL   # state last reported downstream
+
+
+class LimitMonitor:
+    """
+    Evaluates limits over whole batches of calibrated samples and emits a
+    LimitEvent only when a channel's reported state changes.
+
+    Hysteresis and persistence are carried between batches, so feeding one
+    sample at a time gives the same events as feeding one large array.
+    """
+
+    def __init__(self):
+        self.channels = {}
+        self.subscribers = []
+        self.lock = threading.Lock()
+
+    def add_channel_table(self, apid, persistence=3, hysteresis_fraction=0.02):
+        """Monitor the tm.py ADC channels of one APID, using their low/high as red limits."""
+        for name, _, low, high, _ in CHANNELS:
+            self.define((apid, name), ChannelLimits(red_low=low, red_high=high, persistence=persistence,
+                                                    hysteresis=abs(high - low) * hysteresis_fraction))
+
+    def add_derived_limits(self, apid, bounds, persistence=3, hysteresis_fraction=0.02):
+        """
+        Monitor derived channels of one APID.
+
+        Args:
+            bounds (dict): name -> (red_low, red_high[, yellow_low, yellow_high]),
+                as returned by DerivedEngine.limits().
+        """
+        for name, (red_low, red_high, *yellow) in bounds.items():
+            span = abs(red_high - red_low) if red_low is not None and red_high is not None else 0.0
+            self.define((apid, name), ChannelLimits(red_low, red_high, *yellow, persistence=persistence,
+                                                    hysteresis=span * hysteresis_fraction))
+
+    def define(self, key, limits):
+        with self.lock:
+            self.channels[key] = _ChannelState(limits)
+
+    def subscribe(self, callback):
+        """callback(event) is called for every state transition."""
+        self.subscribers.append(callback)
+
+    def state(self, key):
+        return self.channels[key].reported
+
+    def process(self, key, t, values):
+        """
+        Evaluate a batch of samples for one channel.
+
+        Args:
+            key: Channel key given to define(), e.g. (apid, "temp").
+            t (array): Sample timestamps.
+            values (array): Calibrated sample values.
+
+        Returns:
+            list: LimitEvents for every state change in the batch.
+        """
+        state = self.channels.get(key)
+        if state is None:
+            return []
+        t = np.atleast_1d(np.asarray(t, dtype=np.float64))
+        v = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        if len(v) == 0:
+            return []
+        lim = state.limits
+        h = lim.hysteresis
+        with self.lock:
+            flags = {}
+            for name, limit, sign in (("red_low", lim.red_low, -1), ("red_high", lim.red_high, 1),
+                                      ("yellow_low", lim.yellow_low, -1), ("yellow_high", lim.yellow_high, 1)):
+                if limit is None:
+                    flags[name] = np.zeros(len(v), dtype=bool)
+                    continue
+                on = sign * (v - limit) > 0
+                off = sign * (v - limit) < -h
+                flags[name] = _latch(on, off, state.flags[name])
+                state.flags[name] = bool(flags[name][-1])
+            level = np.where(flags["red_low"] | flags["red_high"], RED,
+                             np.where(flags["yellow_low"] | flags["yellow_high"], YELLOW, NOMINAL))
+
+            # run length of the current level, continuing the run from the last batch
+            pos = np.arange(len(level))
+            prev_level = np.concatenate(([state.level], level[:-1]))
+            start = np.maximum.accumulate(np.where(level != prev_level, pos, -1))
+            run = np.where(start >= 0, pos - start + 1, pos + 1 + state.run)
+
+            # a level is reported once it has persisted long enough
+            qualified = run >= lim.persistence
+            last = np.maximum.accumulate(np.where(qualified, pos, -1))
+            reported = np.where(last >= 0, level[np.maximum(last, 0)], state.reported)
+            prev_reported = np.concatenate(([state.reported], reported[:-1]))
+            changes = np.flatnonzero(reported != prev_reported)
+
+            events = [LimitEvent(key, float(t[i]), float(v[i]), int(prev_reported[i]), int(reported[i]))
+                      for i in changes]
+            state.level = int(level[-1])
+            state.run = int(run[-1])
+            state.reported = int(reported[-1])
+
+        for event in events:
+            for callback in self.subscribers:
+                callback(event)
+        return events
+
+    def process_packet(self, apid, channels, t):
+        """
+        Feed the (name, raw, value) list from Telemetery.channels(). APIDs
+        seen for the first time get the default channel table limits.
+        """
+        if (apid, CHANNELS[0][0]) not in self.channels:
+            self.add_channel_table(apid)
+        events = []
+        for name, raw, value in channels:
+            events.extend(self.process((apid, name), t, value))
+        return events
@@ -0,0 +1,200 @@
+import argparse
+import collections
+import threading
+import time
+
+from ccsds_pkg import CCSDS_Deframer
+from layout import CRC_LEN, SEQUENCE_MODULO, frame_apid, frame_sequence
+
+SEQ_MODULO = SEQUENCE_MODULO  # sequence_number is a 14-bit counter
+SEQ_HALF = SEQ_MODULO // 2
+RESYNC_FRAMES = 3  # consecutive late frames in sequence that mean the source restarted its count
+
+
+def frame_key(frame):
+    """(apid, sequence_number, crc) of a serialized frame, read without a full decode."""
+    return frame_apid(frame), frame_sequence(frame), bytes(frame[-CRC_LEN:])
+
+
+class DedupWindow:
+    """Set of the most recent `size` keys; the oldest key is forgotten first."""
+
+    def __init__(self, size):
+        self.order = collections.deque()
+        self.keys = set()
+        self.size = size
+
+    def add(self, key):
+        """Returns False if the key was already in the window."""
+        if key in self.keys:
+            return False
+        if len(self.order) >= self.size:
+            self.keys.discard(self.order.popleft())
+        self.order.append(key)
+        self.keys.add(key)
+        return True
+
+
+class LinkStats:
+    def __init__(self):
+        self.received = 0
+        self.contributed = 0  # frames this link delivered first
+        self.duplicates = 0
+        self.crc_errors = 0
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+class LinkMerger:
+    """
+    Merges the same TM stream received on several redundant links.
+
+    Frames are deduplicated by (APID, sequence count, CRC) over a bounded
+    window, then put back in sequence-count order per APID: a frame that
+    arrives ahead of the expected count waits in a small reorder buffer
+    until the gap is filled, the buffer exceeds `reorder_window` frames,
+    or the gap is older than `max_wait` seconds. Sequence comparisons use
+    the 14-bit wraparound. RESYNC_FRAMES consecutive late frames that follow
+    each other in sequence mean the source restarted its count (e.g. a
+    reboot): the APID resumes from them and the event counts as a restart.
+    """
+
+    def __init__(self, emit, reorder_window=16, dedup_size=4096, max_wait=0.5):
+        """
+        Args:
+            emit (callable): Called with each frame of the merged stream.
+            reorder_window (int): Frames held per APID while waiting for a gap.
+            dedup_size (int): Number of recent frame keys remembered.
+            max_wait (float): Seconds a gap may hold frames back.
+        """
+        self.emit = emit
+        self.reorder_window = reorder_window
+        self.max_wait = max_wait
+        self.seen = DedupWindow(dedup_size)
+        self.expected = {}  # apid -> next sequence count to emit
+        self.pending = {}   # apid -> {seq: (arrival time, frame)}
+        self.links = collections.defaultdict(LinkStats)
+        self.gaps = 0       # sequence counts skipped while flushing
+        self.late = 0       # frames arriving after their slot was passed
+        self.restarts = 0   # sequence count restarts detected from runs of late frames
+        self.behind = {}    # apid -> (consecutive late frames, sequence count continuing the run)
+        self.lock = threading.Lock()
+        self._threads = []
+        self._running = False
+
+    def feed(self, link, valid, frame):
+        """Offer one frame received on `link` (any hashable link name)."""
+        stats = self.links[link]
+        stats.received += 1
+        if not valid:
+            stats.crc_errors += 1
+            return
+        apid, seq, crc = frame_key(frame)
+        with self.lock:
+            if not self.seen.add((apid, seq, crc)):
+                stats.duplicates += 1
+                return
+            stats.contributed += 1
+            expected = self.expected.get(apid)
+            if expected is None:
+                expected = seq
+            ahead = (seq - expected) % SEQ_MODULO
+            if ahead >= SEQ_HALF:
+                # its slot has already been emitted or skipped
+                run, run_next = self.behind.get(apid, (0, None))
+                run = run + 1 if run and seq == run_next else 1
+                self.behind[apid] = (run, (seq + 1) % SEQ_MODULO)
+                if run >= RESYNC_FRAMES:
+                    self._restart(apid, (seq + 1) % SEQ_MODULO)
+                else:
+                    self.late += 1
+                self.emit(frame)
+                return
+            self.behind.pop(apid, None)
+            pending = self.pending.setdefault(apid, {})
+            pending[seq] = (time.monotonic(), frame)
+            self.expected[apid] = self._drain(apid, expected, pending)
+            if len(pending) > self.reorder_window:
+                self._skip_gap(apid)
+
+    def _drain(self, apid, expected, pending):
+        while expected in pending:
+            self.emit(pending.pop(expected)[1])
+            expected = (expected + 1) % SEQ_MODULO
+        return expected
+
+    def _restart(self, apid, expected):
+        """Release what was held for the old count and resume at `expected`."""
+        pending = self.pending.get(apid, {})
+        while pending:
+            self._skip_gap(apid)
+        self.late -= RESYNC_FRAMES - 1  # the start of the run was counted as late
+        self.restarts += 1
+        self.expected[apid] = expected
+        del self.behind[apid]
+
+    def _skip_gap(self, apid):
+        """Give up on the missing count(s) and resume at the oldest buffered frame."""
+        pending = self.pending[apid]
+        expected = self.expected[apid]
+        nearest = min(pending, key=lambda s: (s - expected) % SEQ_MODULO)
+        self.gaps += (nearest - expected) % SEQ_MODULO
+        self.expected[apid] = self._drain(apid, nearest, pending)
+
+    def flush_stale(self):
+        """Release frames that have waited longer than max_wait for a gap."""
+        limit = time.monotonic() - self.max_wait
+        with self.lock:
+            for apid, pending in self.pending.items():
+                while pending and min(t for t, _ in pending.values()) < limit:
+                    self._skip_gap(apid)
+
+    def add_link(self, name, ser):
+        """Read frames from a serial-like object (read/in_waiting) on its own thread."""
+        def run():
+            deframer = CCSDS_Deframer()
+            while self._running:
+                chunk = ser.read(ser.in_waiting or 1)
+                for valid, frame in deframer.feed(chunk):
+                    self.feed(name, valid, frame)
+        self._running = True
+        thread = threading.Thread(target=run, name=f"link-{name}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def stop(self):
+        self._running = False
+        for thread in self._threads:
+            thread.join()
+        with self.lock:
+            for apid in list(self.pending):
+                while self.pending[apid]:
+                    self._skip_gap(apid)
+
+    def stats(self):
+        return {"links": {name: s.as_dict() for name, s in self.links.items()},
+                "gaps": self.gaps, "late": self.late, "restarts": self.restarts}
+
+
+if __name__ == "__main__":
+    import serial
+
+    parser = argparse.ArgumentParser(description="Merge one TM stream received on redundant serial ports")
+    parser.add_argument("ports", nargs="+", help="Serial ports carrying the same stream")
+    parser.add_argument("--baud", type=int, default=115200)
+    parser.add_argument("--output", default="merged.bin", help="File receiving the merged frames")
+    args = parser.parse_args()
+
+    with open(args.output, "wb") as output_file:
+        merger = LinkMerger(output_file.write)
+        for port in args.ports:
+            merger.add_link(port, serial.Serial(port=port, baudrate=args.baud, timeout=0.1))
+        try:
+            while True:
+                time.sleep(1)
+                merger.flush_stale()
+                print(merger.stats())
+        except KeyboardInterrupt:
+            merger.stop()
+            print(merger.stats())
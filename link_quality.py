@@ -0,0 +1,150 @@
+import time
+
+from layout import SEQUENCE_MODULO, frame_apid, frame_sequence
+
+SEQ_MODULO = SEQUENCE_MODULO  # sequence_number is a 14-bit counter
+SEQ_HALF = SEQ_MODULO // 2
+RESYNC_FRAMES = 3  # consecutive frames behind the window that mean the source restarted its count
+
+# Counter positions in a rolling-window bucket
+FRAMES, BYTES, GAPS, DUPLICATES, OUT_OF_ORDER, CRC_ERRORS, RESYNC_BYTES, RESTARTS = range(8)
+COUNTER_NAMES = ("frames", "bytes", "gaps", "duplicates", "out_of_order", "crc_errors", "resync_bytes", "restarts")
+
+
+class ApidQuality:
+    """Running sequence accounting for one APID."""
+
+    def __init__(self):
+        self.expected = None  # next sequence count we expect
+        self.frames = 0
+        self.gaps = 0         # sequence counts never received (so far)
+        self.duplicates = 0
+        self.out_of_order = 0
+        self.crc_errors = 0
+        self.restarts = 0     # sequence count restarts (e.g. a device reboot)
+        self.behind = 0       # consecutive in-sequence frames behind the window
+        self.behind_next = None  # sequence count continuing that run
+        self.behind_filled = 0   # gaps those frames were taken to fill
+
+    def as_dict(self):
+        return {"frames": self.frames, "gaps": self.gaps, "duplicates": self.duplicates,
+                "out_of_order": self.out_of_order, "crc_errors": self.crc_errors,
+                "restarts": self.restarts, "expected": self.expected}
+
+
+class LinkQualityMonitor:
+    """
+    Per-APID link quality accounting at O(1) cost per frame.
+
+    Each frame's 14-bit sequence count is compared with the count expected
+    for its APID:
+      - equal: in order
+      - ahead: the skipped counts are added to `gaps`
+      - one behind: a repeat of the previous frame, counted as a duplicate
+      - further behind: a late (out-of-order) frame, which also fills one gap
+    A run of RESYNC_FRAMES consecutive counts further behind is not
+    reordering but a source that restarted its count (e.g. a reboot): those
+    frames are reclassified as a restart and the expected count follows them.
+    Totals are kept since start, and per-second buckets give rates over the
+    last `window` seconds.
+    """
+
+    def __init__(self, window=10):
+        self.window = window
+        self.apids = {}
+        self.totals = [0] * len(COUNTER_NAMES)
+        self.buckets = [[-1] + [0] * len(COUNTER_NAMES) for _ in range(window)]
+
+    def _bucket(self, now=None):
+        second = int(time.monotonic() if now is None else now)
+        bucket = self.buckets[second % self.window]
+        if bucket[0] != second:
+            bucket[0] = second
+            for i in range(1, len(bucket)):
+                bucket[i] = 0
+        return bucket
+
+    def _count(self, counter, n=1, now=None):
+        self.totals[counter] += n
+        self._bucket(now)[counter + 1] += n
+
+    def on_frame(self, apid, sequence_number, crc_ok=True, length=0, now=None):
+        """Account for one received frame."""
+        quality = self.apids.get(apid)
+        if quality is None:
+            quality = self.apids[apid] = ApidQuality()
+        self._count(FRAMES, now=now)
+        self._count(BYTES, length, now)
+        if not crc_ok:
+            # the sequence count of a corrupted frame can't be trusted
+            quality.crc_errors += 1
+            self._count(CRC_ERRORS, now=now)
+            return
+        quality.frames += 1
+        if quality.expected is not None:
+            diff = (sequence_number - quality.expected) % SEQ_MODULO
+            if diff == SEQ_MODULO - 1:
+                quality.duplicates += 1
+                self._count(DUPLICATES, now=now)
+                return
+            if diff >= SEQ_HALF:
+                if quality.behind and sequence_number == quality.behind_next:
+                    quality.behind += 1
+                else:
+                    quality.behind = 1
+                    quality.behind_filled = 0
+                quality.behind_next = (sequence_number + 1) % SEQ_MODULO
+                if quality.behind >= RESYNC_FRAMES:
+                    self._restart(quality, now)
+                    quality.expected = quality.behind_next
+                    return
+                quality.out_of_order += 1
+                self._count(OUT_OF_ORDER, now=now)
+                if quality.gaps:
+                    quality.gaps -= 1
+                    quality.behind_filled += 1
+                    self._count(GAPS, -1, now)
+                return
+            quality.behind = 0
+            if diff:
+                quality.gaps += diff
+                self._count(GAPS, diff, now)
+        quality.expected = (sequence_number + 1) % SEQ_MODULO
+
+    def _restart(self, quality, now=None):
+        """Undo the out-of-order accounting of the run that revealed a restart."""
+        undone = quality.behind - 1
+        quality.out_of_order -= undone
+        self._count(OUT_OF_ORDER, -undone, now)
+        quality.gaps += quality.behind_filled
+        self._count(GAPS, quality.behind_filled, now)
+        quality.restarts += 1
+        self._count(RESTARTS, now=now)
+        quality.behind = 0
+        quality.behind_filled = 0
+
+    def on_frame_bytes(self, valid, frame, now=None):
+        """on_frame() for a serialized frame (sync word included)."""
+        self.on_frame(frame_apid(frame), frame_sequence(frame), valid, len(frame), now)
+
+    def on_resync(self, nbytes, now=None):
+        """Account for bytes discarded while hunting for the sync word."""
+        self._count(RESYNC_BYTES, nbytes, now)
+
+    def rates(self, now=None):
+        """
+        Returns:
+            dict: Per-second rate of every counter over the rolling window.
+        """
+        second = int(time.monotonic() if now is None else now)
+        sums = [0] * len(COUNTER_NAMES)
+        for bucket in self.buckets:
+            if second - self.window < bucket[0] <= second:
+                for i in range(len(sums)):
+                    sums[i] += bucket[i + 1]
+        return {name: sums[i] / self.window for i, name in enumerate(COUNTER_NAMES)}
+
+    def report(self, now=None):
+        return {"totals": dict(zip(COUNTER_NAMES, self.totals)),
+                "rates": self.rates(now),
+                "apids": {f"0x{apid:03X}": q.as_dict() for apid, q in self.apids.items()}}
@@ -0,0 +1,309 @@
+import bisect
+import collections
+import threading
+import time
+import weakref
+
+from layout import frame_apid
+
+# Latency buckets in seconds, from 100 µs to an hour (queued or replayed frames can be minutes late)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+# Batch size buckets in items
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class _Owner:
+    """Lives in a thread's local storage; its finalizer retires the thread's slot."""
+    __slots__ = ("__weakref__",)
+
+
+class _ThreadSlots:
+    """
+    Per-thread storage for hot-path updates.
+
+    Each thread increments its own dict, so updates never take a lock and
+    never race with another writer; readers sum the slots of all threads.
+    The lock is only taken when a thread creates its slot and by readers.
+    When a thread ends its slot is queued for retirement and later merged
+    into `_retired`, so short-lived threads or greenlets (one per Socket.IO
+    event under eventlet) do not leave a slot each behind.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._slots = {}    # id(owner) -> slot of a live thread
+        self._retired = {}  # merged slots of finished threads
+        self._retiring = collections.deque()  # keys of finished threads, merged by _drain()
+        self._lock = threading.Lock()
+
+    def slot(self):
+        try:
+            return self._local.slot
+        except AttributeError:
+            slot = self._local.slot = {}
+            owner = self._local.owner = _Owner()
+            with self._lock:
+                self._drain()
+                self._slots[id(owner)] = slot
+            weakref.finalize(owner, self._retiring.append, id(owner))
+            return slot
+
+    def _drain(self):
+        # Called with the lock held. The finalizer only appends to the deque:
+        # it can run during garbage collection on a thread that already holds
+        # the lock, so taking it there could deadlock.
+        while self._retiring:
+            slot = self._slots.pop(self._retiring.popleft(), None)
+            if slot:
+                self._merge(self._retired, slot)
+
+    def _merge(self, into, slot):
+        raise NotImplementedError
+
+    def snapshots(self):
+        with self._lock:
+            self._drain()
+            slots = list(self._slots.values())
+            retired = self._retired.copy()
+        return [retired] + [slot.copy() for slot in slots]
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter(_ThreadSlots):
+    """Monotonic counter, optionally split by label values."""
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__()
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+    def inc(self, amount=1, *labels):
+        """
+        Args:
+            amount: Increment.
+            labels: One value per label name, in order.
+        """
+        slot = self.slot()
+        slot[labels] = slot.get(labels, 0) + amount
+
+    def _merge(self, into, slot):
+        for key, value in slot.items():
+            into[key] = into.get(key, 0) + value
+
+    def values(self):
+        """Returns {label values: total}."""
+        totals = {}
+        for slot in self.snapshots():
+            for key, value in slot.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def samples(self):
+        for key, value in sorted(self.values().items()):
+            yield self.name, _label_text(self.labels, key), value
+
+
+class Gauge:
+    """
+    Current value, either set() directly or read from a function at scrape
+    time (e.g. a queue depth).
+    """
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), function=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.function = function
+        self._values = {}
+
+    def set(self, value, *labels):
+        self._values[labels] = value
+
+    def inc(self, amount=1, *labels):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, amount=1, *labels):
+        self.inc(-amount, *labels)
+
+    def values(self):
+        if self.function is not None:
+            return {(): self.function()}
+        return dict(self._values)
+
+    def samples(self):
+        for key, value in sorted(self.values().items()):
+            yield self.name, _label_text(self.labels, key), value
+
+
+class Histogram(_ThreadSlots):
+    """Bucketed distribution with Prometheus' cumulative le buckets."""
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS, labels=()):
+        super().__init__()
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.bounds = tuple(buckets)
+
+    def observe(self, value, *labels):
+        slot = self.slot()
+        entry = slot.get(labels)
+        if entry is None:
+            entry = slot[labels] = [0] * (len(self.bounds) + 1) + [0.0]
+        entry[bisect.bisect_left(self.bounds, value)] += 1
+        entry[-1] += value
+
+    def _merge(self, into, slot):
+        for key, entry in slot.items():
+            total = into.setdefault(key, [0] * len(entry))
+            for i, v in enumerate(entry):
+                total[i] += v
+
+    def values(self):
+        """Returns {label values: (bucket counts incl. +Inf, sum)}."""
+        totals = {}
+        for slot in self.snapshots():
+            for key, entry in slot.items():
+                total = totals.setdefault(key, [0] * len(entry))
+                for i, v in enumerate(entry):
+                    total[i] += v
+        return {key: (entry[:-1], entry[-1]) for key, entry in totals.items()}
+
+    def quantile(self, q, *labels):
+        """
+        Estimate a quantile as the upper bound of the bucket it falls in.
+
+        Returns:
+            float: The bound, or None if there are no samples or the quantile
+            lies above the top bucket (so snapshots stay valid JSON).
+        """
+        counts, _ = self.values().get(labels, ([0], 0.0))
+        total = sum(counts)
+        if not total:
+            return None
+        running = 0
+        for bound, count in zip(self.bounds, counts):
+            running += count
+            if running >= q * total:
+                return bound
+        return None
+
+    def samples(self):
+        for key, (counts, total) in sorted(self.values().items()):
+            running = 0
+            for bound, count in zip(self.bounds + (float("inf"),), counts):
+                running += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield (f"{self.name}_bucket", _label_text(self.labels + ("le",), key + (le,)), running)
+            yield f"{self.name}_sum", _label_text(self.labels, key), total
+            yield f"{self.name}_count", _label_text(self.labels, key), running
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.add(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=(), function=None):
+        return self.add(Gauge(name, help, labels, function))
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS, labels=()):
+        return self.add(Histogram(name, help, buckets, labels))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        Flat {sample name with labels: value} for counters and gauges, and
+        count/sum/p50/p99 per label set for histograms.
+        """
+        out = {}
+        for metric in self.metrics:
+            if isinstance(metric, Histogram):
+                for key, (counts, total) in metric.values().items():
+                    label = metric.name + _label_text(metric.labels, key)
+                    out[label] = {"count": sum(counts), "sum": total,
+                                  "p50": metric.quantile(0.5, *key), "p99": metric.quantile(0.99, *key)}
+            else:
+                for name, labels, value in metric.samples():
+                    out[name + labels] = value
+        return out
+
+
+class RateMeter:
+    """Turns successive counter snapshots into per-second rates for the stats event."""
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.last = {}
+        self.last_time = time.monotonic()
+        self.sample()  # start the rates from the current totals
+
+    def sample(self):
+        """
+        Returns:
+            dict: {"values": snapshot, "rates": {counter sample: per second}}
+        """
+        now = time.monotonic()
+        values = self.registry.snapshot()
+        dt = max(now - self.last_time, 1e-9)
+        rates = {}
+        for metric in self.registry.metrics:
+            if isinstance(metric, Counter):
+                for name, labels, value in metric.samples():
+                    key = name + labels
+                    rates[key] = (value - self.last.get(key, 0)) / dt
+                    self.last[key] = value
+        self.last_time = now
+        return {"values": values, "rates": rates}
+
+
+class FrameMetrics:
+    """
+    Monitor for CCSDS_Deframer (same hooks as LinkQualityMonitor) counting
+    frames, bytes, CRC errors and resync bytes per link and APID.
+    """
+
+    def __init__(self, registry, link):
+        self.link = link
+        self.frames = registry.counter("ccsds_frames_total", "Frames received", ("link", "apid"))
+        self.bytes = registry.counter("ccsds_bytes_total", "Frame bytes received", ("link", "apid"))
+        self.crc_errors = registry.counter("ccsds_crc_errors_total", "Frames failing their CRC", ("link",))
+        self.resync = registry.counter("ccsds_resync_bytes_total", "Bytes skipped to find a sync word", ("link",))
+
+    def on_frame_bytes(self, valid, frame):
+        apid = f"0x{frame_apid(frame):03X}"
+        self.frames.inc(1, self.link, apid)
+        self.bytes.inc(len(frame), self.link, apid)
+        if not valid:
+            self.crc_errors.inc(1, self.link)
+
+    def on_resync(self, n):
+        self.resync.inc(n, self.link)
+
+
+REGISTRY = Registry()
@@ -0,0 +1,408 @@
+import itertools
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ccsds_pkg import CCSDS_Deframer
+from layout import PRIMARY, SYNC_BYTES, frame_apid, frame_length
+
+# Topic layout shared by the UART end and the web server
+TELEMETRY_TOPIC = "swan/telemetry"      # frames are published on swan/telemetry/<apid>
+TELECOMMAND_TOPIC = "swan/telecommand"  # commands for the UART end
+ACK_TOPIC = "swan/ack"                  # acknowledgements / TM responses to commands
+
+# Telecommand and acknowledgement payloads are prefixed with a correlation ID
+CMD_PREFIX = struct.Struct(">I")   # correlation ID, followed by the encoded TC frame
+# Each telemetry frame is prefixed with the time the UART end received it
+RX_STAMP = struct.Struct(">Q")     # host receive time in µs since the epoch, followed by the frame
+# Each ack is length-prefixed so several can share one MQTT message
+ACK_PREFIX = struct.Struct(">IBH")  # correlation ID + status + response length, followed by the TM response (if any)
+
+ACK_OK = 0           # device answered with a valid TM frame
+ACK_CRC_ERROR = 1    # device answered but the response failed its CRC
+ACK_NO_RESPONSE = 2  # nothing came back before the response timeout
+ACK_REJECTED = 3     # command frame was invalid or the port is not open
+ACK_TENTATIVE = 4    # valid TM frame that may be periodic telemetry rather than the response
+ACK_STATUS_TEXT = {ACK_OK: "ok", ACK_CRC_ERROR: "crc error", ACK_NO_RESPONSE: "no response", ACK_REJECTED: "rejected",
+                   ACK_TENTATIVE: "ok (tentative)"}
+
+# Outgoing queue policies
+POLICY_BLOCK = "block"              # publisher waits until there is room
+POLICY_DROP_NEWEST = "drop_newest"  # discard the message being queued
+POLICY_DROP_OLDEST = "drop_oldest"  # discard the oldest queued message
+POLICIES = (POLICY_BLOCK, POLICY_DROP_NEWEST, POLICY_DROP_OLDEST)
+
+
+def telemetry_topic(apid):
+    """Return the per-APID telemetry topic, e.g. swan/telemetry/123."""
+    return f"{TELEMETRY_TOPIC}/{apid:03X}"
+
+
+def stamp_frame(frame, received=None):
+    """
+    Prefix a frame with its host receive time for publishing.
+
+    Args:
+        frame (bytes): Serialized frame, starting with the 0x55AA sync word.
+        received (float): Epoch seconds the frame came off the serial port; defaults to now.
+    """
+    if received is None:
+        received = time.time()
+    return RX_STAMP.pack(int(received * 1e6)) + bytes(frame)
+
+
+def split_frames(payload, monitor=None):
+    """
+    Split a (possibly batched) MQTT payload back into individual frames.
+
+    A batch is simply the stamped frames concatenated back to back: each
+    RX_STAMP is followed by a frame carrying its own sync word and length.
+
+    Args:
+        payload (bytes): MQTT message payload.
+        monitor: Optional deframer monitor (LinkQualityMonitor, FrameMetrics).
+
+    Returns:
+        list: (received, valid, frame) tuples; received is the host receive
+        time in epoch seconds, valid and frame as from CCSDS_Deframer.feed().
+    """
+    deframer = CCSDS_Deframer(monitor)
+    out = []
+    pos = 0
+    while len(payload) - pos >= RX_STAMP.size + SYNC_BYTES + PRIMARY.size:
+        received_us, = RX_STAMP.unpack_from(payload, pos)
+        start = pos + RX_STAMP.size
+        pos = start + frame_length(payload, start)
+        out.extend((received_us / 1e6, valid, frame) for valid, frame in deframer.feed(payload[start:pos]))
+    return out
+
+
+def pack_command(correlation_id, frame):
+    return CMD_PREFIX.pack(correlation_id) + bytes(frame)
+
+
+def unpack_command(payload):
+    """Returns (correlation_id, frame)."""
+    (correlation_id,) = CMD_PREFIX.unpack_from(payload)
+    return correlation_id, payload[CMD_PREFIX.size:]
+
+
+def pack_ack(correlation_id, status, response=b""):
+    return ACK_PREFIX.pack(correlation_id, status, len(response)) + bytes(response)
+
+
+def unpack_acks(payload):
+    """
+    Split an ack message into its acks.
+
+    Returns:
+        list: (correlation_id, status, response_frame) tuples.
+    """
+    acks = []
+    pos = 0
+    while len(payload) - pos >= ACK_PREFIX.size:
+        correlation_id, status, length = ACK_PREFIX.unpack_from(payload, pos)
+        pos += ACK_PREFIX.size
+        acks.append((correlation_id, status, bytes(payload[pos:pos + length])))
+        pos += length
+    return acks
+
+
+class CommandTracker:
+    """
+    Keeps track of telecommands in flight on the web side.
+
+    Commands are sent without waiting for the previous acknowledgement, up to
+    max_in_flight at a time; each ack is matched by correlation ID and its
+    round-trip latency recorded.
+    """
+
+    def __init__(self, max_in_flight=64, timeout=10.0):
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.in_flight = {}  # correlation ID -> send time
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.completed = 0
+        self.timed_out = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def start(self):
+        """
+        Allocate a correlation ID for a new command.
+
+        Returns:
+            int: The correlation ID, or None if the in-flight window is full.
+        """
+        with self.lock:
+            if len(self.in_flight) >= self.max_in_flight:
+                return None
+            correlation_id = next(self._ids) & 0xFFFFFFFF
+            self.in_flight[correlation_id] = time.monotonic()
+        return correlation_id
+
+    def complete(self, correlation_id):
+        """
+        Mark a command as acknowledged.
+
+        Returns:
+            float: Round-trip latency in seconds, or None for unknown/expired IDs.
+        """
+        with self.lock:
+            sent = self.in_flight.pop(correlation_id, None)
+            if sent is None:
+                return None
+            latency = time.monotonic() - sent
+            self.completed += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+        return latency
+
+    def expire(self):
+        """Drop and return the IDs of commands older than the timeout."""
+        limit = time.monotonic() - self.timeout
+        with self.lock:
+            expired = [cid for cid, sent in self.in_flight.items() if sent < limit]
+            for cid in expired:
+                del self.in_flight[cid]
+            self.timed_out += len(expired)
+        return expired
+
+    def stats(self):
+        with self.lock:
+            mean = self.latency_total / self.completed if self.completed else 0.0
+            return {"in_flight": len(self.in_flight), "completed": self.completed,
+                    "timed_out": self.timed_out, "latency_mean_ms": mean * 1e3,
+                    "latency_max_ms": self.latency_max * 1e3}
+
+
+class PublishQueue:
+    """
+    Bounded outgoing queue in front of an MQTT client.
+
+    Frames are queued by the caller and published from a worker thread, so a
+    slow or disconnected broker never stalls the serial receive loop. Frames
+    for the same APID are batched into one message when batch_size > 1.
+    """
+
+    def __init__(self, client, maxsize=1000, policy=POLICY_DROP_OLDEST, qos=0,
+                 batch_size=1, batch_interval=0.05):
+        """
+        Args:
+            client: paho MQTT client (or LocalClient).
+            maxsize (int): Maximum number of queued frames.
+            policy (str): One of POLICIES, applied when the queue is full.
+            qos (int): MQTT QoS used for every publish.
+            batch_size (int): Maximum frames per MQTT message.
+            batch_interval (float): Maximum time (s) a partial batch is held back.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Invalid queue policy: {policy}")
+        self.client = client
+        self.policy = policy
+        self.qos = qos
+        self.batch_size = max(1, batch_size)
+        self.batch_interval = batch_interval
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self.published = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, topic, payload):
+        """
+        Queue one message, applying the queue policy if it is full.
+
+        Returns:
+            bool: False if the message (or an older one) was dropped.
+        """
+        item = (topic, bytes(payload))
+        if self.policy == POLICY_BLOCK:
+            self.queue.put(item)
+            return True
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        self.dropped += 1
+        if self.policy == POLICY_DROP_OLDEST:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                pass
+        return False
+
+    def put_frame(self, frame, received=None):
+        """Queue a CCSDS frame on its per-APID telemetry topic, stamped with its receive time."""
+        return self.put(telemetry_topic(frame_apid(frame)), stamp_frame(frame, received))
+
+    def close(self, timeout=2.0):
+        """Publish whatever is still queued and stop the worker."""
+        self._running = False
+        self._thread.join(timeout)
+
+    def _run(self):
+        pending = {}  # topic -> list of payloads waiting to be batched
+        deadline = None
+        while self._running or not self.queue.empty():
+            wait = 0.1 if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                topic, payload = self.queue.get(timeout=wait)
+                batch = pending.setdefault(topic, [])
+                batch.append(payload)
+                if deadline is None:
+                    deadline = time.monotonic() + self.batch_interval
+                if len(batch) >= self.batch_size:
+                    self._publish(topic, pending.pop(topic))
+            except queue.Empty:
+                pass
+            stopping = not self._running and self.queue.empty()
+            if pending and (time.monotonic() >= deadline or stopping):
+                for topic, batch in pending.items():
+                    self._publish(topic, batch)
+                pending.clear()
+            if not pending:
+                deadline = None
+        for topic, batch in pending.items():
+            self._publish(topic, batch)
+
+    def _publish(self, topic, batch):
+        self.client.publish(topic, b"".join(batch), qos=self.qos)
+        self.published += 1
+
+
+class LocalMessage:
+    """Minimal stand-in for paho's MQTTMessage."""
+
+    def __init__(self, topic, payload, qos=0):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+
+
+def topic_matches(pattern, topic):
+    """MQTT topic filter match supporting the '+' and '#' wildcards."""
+    p_parts = pattern.split("/")
+    t_parts = topic.split("/")
+    for i, p in enumerate(p_parts):
+        if p == "#":
+            return True
+        if i >= len(t_parts):
+            return False
+        if p != "+" and p != t_parts[i]:
+            return False
+    return len(p_parts) == len(t_parts)
+
+
+class LocalBroker:
+    """
+    In-process broker stand-in, so both ends can be exercised without a
+    network connection. Messages are delivered synchronously to every
+    LocalClient subscribed with a matching filter.
+    """
+
+    def __init__(self):
+        self.clients = []
+        self.lock = threading.Lock()
+
+    def route(self, topic, payload, qos):
+        with self.lock:
+            targets = [c for c in self.clients
+                       if any(topic_matches(f, topic) for f in c.subscriptions)]
+        for client in targets:
+            if client.on_message:
+                client.on_message(client, client.userdata, LocalMessage(topic, payload, qos))
+
+
+class LocalClient:
+    """Subset of the paho.mqtt.client.Client API backed by a LocalBroker."""
+
+    def __init__(self, broker, userdata=None):
+        self.broker = broker
+        self.userdata = userdata
+        self.subscriptions = set()
+        self.on_connect = None
+        self.on_message = None
+
+    def connect(self, host=None, port=None, keepalive=60):
+        with self.broker.lock:
+            self.broker.clients.append(self)
+        if self.on_connect:
+            self.on_connect(self, self.userdata, {}, 0, None)
+        return 0
+
+    def subscribe(self, topic, qos=0):
+        self.subscriptions.add(topic)
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        self.broker.route(topic, bytes(payload), qos)
+
+    def loop_start(self):
+        pass
+
+    def loop_stop(self):
+        pass
+
+    def disconnect(self):
+        with self.broker.lock:
+            if self in self.broker.clients:
+                self.broker.clients.remove(self)
+
+
+def add_broker_arguments(parser):
+    """Add the broker/queue options shared by both MQTT scripts."""
+    parser.add_argument("--broker", default="localhost", help="MQTT broker host (default: localhost)")
+    parser.add_argument("--port", type=int, default=1883, help="MQTT broker port")
+    parser.add_argument("--qos", type=int, choices=(0, 1, 2), default=0, help="MQTT QoS for published messages")
+    parser.add_argument("--queue-size", type=int, default=1000, help="Outgoing queue size (messages)")
+    parser.add_argument("--queue-policy", choices=POLICIES, default=POLICY_DROP_OLDEST,
+                        help="What to do when the outgoing queue is full")
+
+
+if __name__ == "__main__":
+    # Loopback check through the in-process broker: no network needed
+    import struct
+    import zlib
+    from ccsds_pkg import CCSDS_Packet, CCSDS_Packet_Header
+
+    broker = LocalBroker()
+    received = []
+
+    def on_message(client, userdata, msg):
+        for rx_time, valid, frame in split_frames(msg.payload):
+            received.append((msg.topic, valid, CCSDS_Packet.from_frame(frame)))
+
+    web_end = LocalClient(broker)
+    web_end.on_message = on_message
+    web_end.connect()
+    web_end.subscribe(TELEMETRY_TOPIC + "/+")
+
+    uart_end = LocalClient(broker)
+    uart_end.connect()
+    publisher = PublishQueue(uart_end, maxsize=16, batch_size=4)
+    for seq in range(10):
+        header = CCSDS_Packet_Header()
+        header.apid = 0x123 if seq % 2 else 0x124
+        header.sequence_number = seq
+        data = struct.pack(">2H", seq, 0x0805)
+        header.data_length = CCSDS_Packet_Header.SEC_HDR_LEN + len(data) + CCSDS_Packet_Header.CRC_LEN - 1
+        crc = zlib.crc32(bytes(header) + data) & 0xFFFFFFFF
+        publisher.put_frame(CCSDS_Packet(header, data, crc).to_bytes())
+    publisher.close()
+
+    for topic, valid, packet in received:
+        print(f"{topic}: valid={valid} seq={packet.header.sequence_number} data={packet.data.hex()}")
+    print(f"{publisher.published} messages carried {len(received)} frames, {publisher.dropped} dropped")
@@ -1,22 +1,57 @@
+import argparse
+import os
+import struct
+import sys
+import time
+
 import paho.mqtt.client as mqtt
-from flask import Flask, render_template
+from flask import Flask, Response, render_template
 from flask_socketio import SocketIO
 import eventlet
 
+from ccsds_mqtt import (TELEMETRY_TOPIC, TELECOMMAND_TOPIC, ACK_TOPIC, ACK_OK, ACK_TENTATIVE, ACK_STATUS_TEXT, CommandTracker,
+                        PublishQueue, add_broker_arguments, pack_command, split_frames, unpack_acks)
+from ccsds_pkg import CCSDS_Packet
+from derived import DerivedEngine
+from limits import LimitMonitor, STATE_NAMES
+from metrics import REGISTRY, SIZE_BUCKETS, FrameMetrics, RateMeter
+from profiler import add_profile_arguments, profile_from_args
+from tm import Telemetery
+from tm_cache import TelemetryCache
+from tm_store import TelemetryStore
+
 # Flask Setup
 app = Flask(__name__)
 socketio = SocketIO(app, cors_allowed_origins="*")
 
 # MQTT Broker Settings
-BROKER = "broker.hivemq.com"
-PORT = 1883
-SUBSCRIBE_TOPIC = "swan/telemetry"  # Receive telemetry
-PUBLISH_TOPIC = "swan/telecommand"  # Send commands
+SUBSCRIBE_TOPIC = TELEMETRY_TOPIC + "/+"  # Receive telemetry for every APID
+PUBLISH_TOPIC = TELECOMMAND_TOPIC  # Send commands
 
 # MQTT Client Setup
 mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+command_queue = None  # PublishQueue for telecommands, created in main
+tracker = CommandTracker()
+telemetry_cache = TelemetryCache()  # recent history per (APID, channel) for queries
+telemetry_store = None  # long-term TelemetryStore, enabled with --store
+limit_monitor = LimitMonitor()
+derived_engines = {}  # APID -> DerivedEngine, created from --derived
+derived_file = None
 
 subscribed = False  # Global variable to track subscription
+crc_errors = 0
+
+# Pipeline health, served on /metrics and pushed as the 'stats' Socket.IO event
+frame_metrics = FrameMetrics(REGISTRY, "mqtt")
+mqtt_messages = REGISTRY.counter("mqtt_messages_total", "MQTT messages received", ("topic",))
+emit_batch = REGISTRY.histogram("socketio_emit_batch_size", "Packets per mqtt_message emit", SIZE_BUCKETS)
+emit_errors = REGISTRY.counter("socketio_emit_errors_total", "Failed Socket.IO emits")
+latency = REGISTRY.histogram("ccsds_end_to_end_latency_seconds",
+                             "UART end receipt to Socket.IO emit (needs synchronised host clocks)")
+clients = REGISTRY.gauge("socketio_clients", "Connected browser clients")
+REGISTRY.gauge("command_queue_depth", "Telecommands waiting to be published",
+               function=lambda: command_queue.queue.qsize() if command_queue else 0)
+REGISTRY.gauge("commands_in_flight", "Telecommands awaiting an ack", function=lambda: len(tracker.in_flight))
 
 def on_connect(client, userdata, flags, reason_code, properties):
     global subscribed
@@ -24,50 +59,213 @@ def on_connect(client, userdata, flags, reason_code, properties):
         if not subscribed:
             print(f"✅ Connected to MQTT Broker! Subscribing to: {SUBSCRIBE_TOPIC}")
             client.subscribe(SUBSCRIBE_TOPIC)
+            client.subscribe(ACK_TOPIC)
             subscribed = True  # Ensure it only subscribes once
     else:
         print(f"⚠️ Connection failed with code {reason_code}")
 
-'''
-def on_message(client, userdata, msg):
-    message = msg.payload.decode()
-    print(f"📩 Telemetry Data: {message}")
-
-    # Ensure message is sent to all clients
-    #socketio.emit('mqtt_message', {'topic': msg.topic, 'message': message}, broadcast=True)
-    #socketio.emit('mqtt_message', {'topic': msg.topic, 'message': message}, namespace='/')
-    #socketio.emit('mqtt_message', {'topic': msg.topic, 'message': message}, namespace='/', broadcast=True)
-    socketio.emit('mqtt_message', {'topic': msg.topic, 'message': message}, namespace='/', to='broadcast')
-'''
+
+def packet_to_dict(packet):
+    """Flatten a decoded packet into something Socket.IO can serialize."""
+    header = packet.header
+    num_words = len(packet.data) // 2
+    return {
+        "apid": header.apid,
+        "sequence_number": header.sequence_number,
+        "function_code": header.function_code,
+        "timing_info": header.get_timing_info(),
+        "data": packet.data.hex(),
+        "adc": list(struct.unpack(f">{num_words}H", packet.data[:num_words * 2])),
+    }
+
+
+def on_ack(msg):
+    for correlation_id, status, response in unpack_acks(msg.payload):
+        latency = tracker.complete(correlation_id)
+        if latency is None:
+            continue  # unknown or already timed out
+        ack = {"id": correlation_id, "status": ACK_STATUS_TEXT.get(status, str(status)),
+               "latency_ms": round(latency * 1e3, 3)}
+        if status in (ACK_OK, ACK_TENTATIVE):
+            ack["response"] = packet_to_dict(CCSDS_Packet.from_frame(response))
+        socketio.emit('command_ack', ack, namespace='/')
+
+
 def on_message(client, userdata, msg):
-    message = msg.payload.decode()
-    print(f"📩 Telemetry Data: {message}")  # Ensure MQTT message is received
+    global crc_errors
+    mqtt_messages.inc(1, msg.topic)
+    if msg.topic == ACK_TOPIC:
+        on_ack(msg)
+        return
+    packets = []
+    received = []
+    for rx_time, valid, frame in split_frames(msg.payload, frame_metrics):
+        if not valid:
+            crc_errors += 1
+            continue
+        packet = CCSDS_Packet.from_frame(frame)
+        apid, now = packet.header.apid, time.time()
+        channels = Telemetery.channels(packet)
+        if derived_file:
+            if apid not in derived_engines:
+                derived_engines[apid] = DerivedEngine()
+                derived_engines[apid].load(derived_file)
+                limit_monitor.add_derived_limits(apid, derived_engines[apid].limits())
+            channels = derived_engines[apid].extend_channels(channels)
+        telemetry_cache.ingest_channels(apid, channels, now)
+        limit_monitor.process_packet(apid, channels, now)
+        if telemetry_store is not None:
+            telemetry_store.ingest_channels(apid, channels, now)
+        pkt = packet_to_dict(packet)
+        pkt["channels"] = {name: value for name, raw, value in channels}
+        packets.append(pkt)
+        received.append(rx_time)
+    if not packets:
+        return
 
     try:
-        # Emit the message to web clients
-        socketio.emit('mqtt_message', {'topic': msg.topic, 'message': message}, namespace='/')
-        print(f"📡 Sent to Web UI: {message}")  # Debug: Confirm message is emitted
+        # Emit the whole batch to web clients in one event
+        for pkt in packets:
+            pkt["message"] = f"APID 0x{pkt['apid']:03X} seq {pkt['sequence_number']}: {pkt['data']}"
+        socketio.emit('mqtt_message', {'topic': msg.topic, 'message': packets[-1]["message"],
+                                       'packets': packets}, namespace='/')
     except Exception as e:
+        emit_errors.inc()
         print(f"❌ SocketIO Emit Error: {e}")  # Catch any errors
+        return
+    emit_batch.observe(len(packets))
+    now = time.time()
+    for rx_time in received:
+        delay = now - rx_time
+        if delay >= 0:  # the UART end's clock may run ahead of ours
+            latency.observe(delay)
 
 
+def on_limit_event(event):
+    apid, channel = event.key
+    socketio.emit('limit_event', {"apid": apid, "channel": channel, "t": event.t, "value": event.value,
+                                  "old": STATE_NAMES[event.old_state], "new": STATE_NAMES[event.new_state]},
+                  namespace='/')
 
 
+limit_monitor.subscribe(on_limit_event)
 mqtt_client.on_connect = on_connect
 mqtt_client.on_message = on_message
 
-mqtt_client.connect(BROKER, PORT, 60)
-mqtt_client.loop_start()
-
 @app.route("/")
 def index():
     return render_template("index.html")
 
+@app.route("/metrics")
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@socketio.on("connect")
+def handle_connect():
+    clients.inc()
+
+@socketio.on("disconnect")
+def handle_disconnect(*args):
+    clients.dec()
+
+@socketio.on("query_telemetry")
+def handle_query_telemetry(json):
+    """
+    Look back at a cached channel: {"apid": 0x123, "channel": "temp"} plus
+    either "n" (newest samples) or "since" (epoch seconds).
+    """
+    apid, channel = int(json["apid"]), json["channel"]
+    if "since" in json:
+        t, raw, value = telemetry_cache.since(apid, channel, float(json["since"]))
+        stats = telemetry_cache.stats(apid, channel, t0=float(json["since"]))
+    else:
+        n = int(json.get("n", 100))
+        t, raw, value = telemetry_cache.last(apid, channel, n)
+        stats = telemetry_cache.stats(apid, channel, n=n)
+    socketio.emit('telemetry_history', {"apid": apid, "channel": channel, "t": t.tolist(),
+                                        "raw": raw.tolist(), "value": value.tolist(), "stats": stats})
+
+
+def encode_command(command):
+    """
+    Turn the text typed in the browser into an encoded telecommand frame.
+
+    Accepts either the name of an .sds file or the frame as hex (with or
+    without the 55 AA sync word).
+    """
+    command = command.strip()
+    if command.endswith(".sds") and os.path.isfile(command):
+        return CCSDS_Packet.from_file(command).to_bytes()
+    frame = bytes.fromhex(command.replace("0x", "").replace(",", " "))
+    if not frame.startswith(b"\x55\xAA"):
+        frame = b"\x55\xAA" + frame
+    return frame
+
+
+def expire_commands():
+    """Background task reporting commands that were never acknowledged."""
+    while True:
+        for correlation_id in tracker.expire():
+            socketio.emit('command_ack', {"id": correlation_id, "status": "timeout"}, namespace='/')
+        socketio.emit('command_stats', tracker.stats(), namespace='/')
+        socketio.sleep(1)
+
+
+def emit_stats(interval=1.0):
+    """Background task pushing metric values and per-second rates to the browser."""
+    meter = RateMeter(REGISTRY)
+    while True:
+        socketio.sleep(interval)
+        socketio.emit('stats', meter.sample(), namespace='/')
+
+
 @socketio.on("publish_message")
 def handle_publish(json):
-    command = json["message"]
-    print(f"📤 Sending Command: {command} to {PUBLISH_TOPIC}")
-    mqtt_client.publish(PUBLISH_TOPIC, command)
+    try:
+        frame = encode_command(json["message"])
+    except (ValueError, OSError) as e:
+        socketio.emit('command_ack', {"id": None, "status": f"invalid command: {e}"})
+        return
+    correlation_id = tracker.start()
+    if correlation_id is None:
+        socketio.emit('command_ack', {"id": None, "status": "too many commands in flight"})
+        return
+    command_queue.put(PUBLISH_TOPIC, pack_command(correlation_id, frame))
+    socketio.emit('command_sent', {"id": correlation_id, "frame": frame.hex(" ").upper()})
 
 if __name__ == "__main__":
-    socketio.run(app, host="0.0.0.0", port=5000, debug=True)
+    parser = argparse.ArgumentParser(description="MQTT -> WebSocket bridge for CCSDS telemetry")
+    add_broker_arguments(parser)
+    parser.add_argument("--store", metavar="DIR", help="Archive calibrated channels to a columnar store in DIR")
+    parser.add_argument("--derived", metavar="FILE", help="Derived parameter definitions (see derived.txt)")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    profiler = profile_from_args(args)
+    if profiler:
+        profiler.instrument(mqtt_client, "on_message", "on_message")
+        profiler.instrument(sys.modules[__name__], "packet_to_dict", "packet_to_dict")
+        profiler.instrument(TelemetryCache, "ingest_channels", "cache")
+        profiler.instrument(LimitMonitor, "process_packet", "limits")
+        profiler.instrument(TelemetryStore, "ingest_channels", "store")
+        profiler.instrument(DerivedEngine, "extend_channels", "derived")
+        profiler.instrument(socketio, "emit", "socketio.emit")
+
+    if args.derived:
+        DerivedEngine().load(args.derived)  # fail early on bad definitions
+        derived_file = args.derived
+    if args.store:
+        telemetry_store = TelemetryStore(args.store)
+        telemetry_store.start_compaction()
+
+    mqtt_client.connect(args.broker, args.port, 60)
+    mqtt_client.loop_start()
+    command_queue = PublishQueue(mqtt_client, maxsize=args.queue_size, policy=args.queue_policy, qos=args.qos)
+    socketio.start_background_task(expire_commands)
+    socketio.start_background_task(emit_stats)
+
+    try:
+        socketio.run(app, host="0.0.0.0", port=5000, debug=True)
+    finally:
+        if telemetry_store is not None:
+            telemetry_store.close()
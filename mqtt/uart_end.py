@@ -1,43 +1,298 @@
-import paho.mqtt.client as mqtt
+import argparse
+import collections
+import queue
+import struct
 import time
+import zlib
+
+import paho.mqtt.client as mqtt
+
+from ccsds_mqtt import (TELECOMMAND_TOPIC, ACK_TOPIC, ACK_OK, ACK_CRC_ERROR, ACK_NO_RESPONSE, ACK_REJECTED,
+                        ACK_TENTATIVE, PublishQueue, add_broker_arguments, frame_apid, pack_ack, unpack_command)
+from ccsds_pkg import CCSDS_Packet, CCSDS_Packet_Header, CCSDS_Deframer
+from layout import frame_address_code, frame_function_code
+from link_quality import LinkQualityMonitor
+from archive import ArchiveWriter
+from profiler import add_profile_arguments, profile_from_args
+
+# How TM responses are matched to outstanding commands
+MATCH_ECHO = "echo"  # same APID, function code and address code as the command
+MATCH_APID = "apid"  # same APID only, for devices that do not echo the codes
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="UART <-> MQTT bridge for CCSDS frames")
+    parser.add_argument("--serial", help="Serial port to read TM frames from (e.g. COM12, /dev/ttyUSB0)")
+    parser.add_argument("--baud", type=int, default=115200, help="Serial baud rate")
+    parser.add_argument("--simulate", type=float, default=0.0, metavar="HZ",
+                        help="Publish simulated ADC frames at HZ instead of reading a serial port")
+    parser.add_argument("--apid", type=lambda s: int(s, 16), default=0x123, help="APID for simulated frames (hex)")
+    parser.add_argument("--batch-size", type=int, default=1, help="Frames per MQTT message")
+    parser.add_argument("--batch-interval", type=float, default=0.05, help="Max time (s) to hold a partial batch")
+    parser.add_argument("--max-outstanding", type=int, default=1,
+                        help="Commands written to the device before waiting for a response")
+    parser.add_argument("--response-timeout", type=float, default=2.0, help="Seconds to wait for a TM response")
+    parser.add_argument("--match", choices=(MATCH_ECHO, MATCH_APID), default=MATCH_ECHO,
+                        help="Match responses on APID + echoed function/address code, or on APID alone (tentative)")
+    parser.add_argument("--stats", type=float, default=0.0, metavar="SECONDS",
+                        help="Print link quality (gaps, duplicates, CRC errors, resync bytes) every SECONDS")
+    parser.add_argument("--archive", metavar="PATH", help="Also archive valid frames to compressed PATH.seg/.idx")
+    add_broker_arguments(parser)
+    add_profile_arguments(parser)
+    return parser.parse_args()
+
+
+def make_adc_frame(apid, sequence_number, adc_values, function_code=0, address_code=0):
+    """
+    Build a serialized TM frame carrying ADC words, like the board sends.
+
+    Args:
+        apid (int): Application ID.
+        sequence_number (int): 14-bit sequence count.
+        adc_values (list): Raw 16-bit ADC readings.
+        function_code (int): Function code (responses echo the command's).
+        address_code (int): Address code (responses echo the command's).
+
+    Returns:
+        bytes: Sync word + header + data + CRC.
+    """
+    data = struct.pack(f">{len(adc_values)}H", *adc_values)
+    header = CCSDS_Packet_Header()
+    header.second_header_flag = 1
+    header.apid = apid
+    header.group_flag = 3
+    header.sequence_number = sequence_number & 0x3FFF
+    # secondary header + data + CRC, - 1 by define
+    header.data_length = CCSDS_Packet_Header.SEC_HDR_LEN + len(data) + CCSDS_Packet_Header.CRC_LEN - 1
+    header.function_code = function_code
+    header.address_code = address_code
+    header.set_timing_info(int(time.time() * 1e6) & 0xFFFFFFFFFFFF)
+    crc = zlib.crc32(bytes(header) + data) & 0xFFFFFFFF
+    return CCSDS_Packet(header, data, crc).to_bytes()
+
+
+def response_key(frame, match=MATCH_ECHO):
+    """Fields a response must share with its command: (apid, function code, address code) or (apid,)."""
+    if match == MATCH_APID:
+        return (frame_apid(frame),)
+    return frame_apid(frame), frame_function_code(frame), frame_address_code(frame)
+
+
+class SimulatedDevice:
+    """
+    Stand-in for the serial port: emits ADC frames (function and address
+    code 0) at a fixed rate and answers every valid telecommand with a TM
+    frame on the same APID echoing the command's function and address code.
+    """
+    # nominal raw readings for the 8 ADC channels decoded by tm.py
+    NOMINAL = [0x0601, 0x03E0, 0x038C, 0x039B, 0x03AB, 0x03AC, 0x0A66, 0x0805]
+
+    def __init__(self, rate, apid, timeout=0.1):
+        self.period = 1.0 / rate
+        self.apid = apid
+        self.timeout = timeout
+        self.next_time = time.monotonic()
+        self.sequence_number = 0
+        self.output = bytearray()
+        self.deframer = CCSDS_Deframer()
+
+    @property
+    def in_waiting(self):
+        return len(self.output)
+
+    def _adc_frame(self, apid, function_code=0, address_code=0):
+        wobble = int(16 * (1 + (self.sequence_number % 64) / 64))
+        frame = make_adc_frame(apid, self.sequence_number, [v + wobble for v in self.NOMINAL],
+                               function_code, address_code)
+        self.sequence_number += 1
+        return frame
+
+    def write(self, data):
+        for valid, frame in self.deframer.feed(data):
+            if valid:
+                self.output.extend(self._adc_frame(*response_key(frame)))
+        return len(data)
 
-# MQTT Broker Settings
-BROKER = "broker.hivemq.com"  # Public broker
-PORT = 1883
-PUBLISH_TOPIC = "swan/telemetry"  # Publish telemetry data here
-SUBSCRIBE_TOPIC = "swan/telecommand"  # Listen for telecommands
+    def read(self, size=1):
+        now = time.monotonic()
+        if not self.output:
+            time.sleep(max(0.0, min(self.next_time - now, self.timeout)))
+            now = time.monotonic()
+        if now >= self.next_time:
+            self.output.extend(self._adc_frame(self.apid))
+            self.next_time += self.period
+        chunk = bytes(self.output[:size])
+        del self.output[:size]
+        return chunk
 
-counter = 0  # Initialize counter
 
-# Create MQTT client (New API)
-client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+class CommandLink:
+    """
+    Writes telecommands received over MQTT to the device and matches the TM
+    responses to them.
+
+    Commands arrive from the MQTT network thread through a bounded queue; the
+    serial thread writes up to max_outstanding of them and pairs each later
+    TM frame with the oldest outstanding command it matches. Every command
+    gets exactly one ack on ACK_TOPIC carrying its correlation ID.
+
+    With MATCH_ECHO a response must carry the command's APID, function code
+    and address code. Periodic telemetry can still share all three (e.g. a
+    command with function code 0 on the housekeeping APID), so every valid
+    frame that answers no command marks its key as unsolicited, and later
+    matches on such a key are acked ACK_TENTATIVE rather than ACK_OK. With
+    MATCH_APID every match is tentative. A housekeeping frame arriving
+    before the first unsolicited one was seen can still be taken for a
+    response.
+
+    Acks are published straight to the client rather than through the
+    telemetry PublishQueue, so they are never batched or dropped with TM.
+    """
+
+    def __init__(self, ser, client, qos=0, max_outstanding=1, response_timeout=2.0, queue_size=100,
+                 match=MATCH_ECHO):
+        self.ser = ser
+        self.client = client
+        self.qos = qos
+        self.max_outstanding = max(1, max_outstanding)
+        self.response_timeout = response_timeout
+        self.commands = queue.Queue(queue_size)
+        self.match = match
+        self.outstanding = collections.deque()  # (correlation_id, response key, deadline)
+        self.unsolicited = set()  # response keys seen on frames that answered no command
+
+    def submit(self, payload):
+        """Called from the MQTT thread with a raw telecommand payload."""
+        correlation_id, frame = unpack_command(payload)
+        frames = CCSDS_Deframer().feed(frame)
+        if len(frames) != 1 or not frames[0][0]:
+            print(f"⚠️ Rejected command {correlation_id}: not a valid CCSDS frame")
+            self._ack(correlation_id, ACK_REJECTED)
+            return
+        try:
+            self.commands.put_nowait((correlation_id, frames[0][1]))
+        except queue.Full:
+            print(f"⚠️ Rejected command {correlation_id}: command queue full")
+            self._ack(correlation_id, ACK_REJECTED)
+
+    def _ack(self, correlation_id, status, response=b""):
+        self.client.publish(ACK_TOPIC, pack_ack(correlation_id, status, response), qos=self.qos)
+
+    def poll(self):
+        """Expire overdue commands and write queued ones. Call from the serial thread."""
+        now = time.monotonic()
+        while self.outstanding and self.outstanding[0][2] < now:
+            correlation_id, _, _ = self.outstanding.popleft()
+            self._ack(correlation_id, ACK_NO_RESPONSE)
+        while len(self.outstanding) < self.max_outstanding:
+            try:
+                correlation_id, frame = self.commands.get_nowait()
+            except queue.Empty:
+                break
+            self.ser.write(frame)
+            self.outstanding.append((correlation_id, response_key(frame, self.match), now + self.response_timeout))
+
+    def on_frame(self, valid, frame):
+        """
+        Offer a received frame as a response to an outstanding command.
+
+        Returns:
+            bool: True if the frame acknowledged a command.
+        """
+        key = response_key(frame, self.match)
+        for entry in self.outstanding:
+            if entry[1] == key:
+                self.outstanding.remove(entry)
+                if not valid:
+                    status = ACK_CRC_ERROR
+                elif self.match == MATCH_APID or key in self.unsolicited:
+                    status = ACK_TENTATIVE
+                else:
+                    status = ACK_OK
+                self._ack(entry[0], status, frame)
+                return True
+        if valid:
+            self.unsolicited.add(key)
+        return False
+
+
+command_link = None  # set in main, used by on_message
+
 
 # Callback when connected to the broker
 def on_connect(client, userdata, flags, reason_code, properties):
     if reason_code == 0:
         print(f"✅ Connected to MQTT Broker!")
-        print(f"📡 Subscribing to: {SUBSCRIBE_TOPIC}")
-        client.subscribe(SUBSCRIBE_TOPIC)
+        print(f"📡 Subscribing to: {TELECOMMAND_TOPIC}")
+        client.subscribe(TELECOMMAND_TOPIC, qos=userdata or 0)
     else:
         print(f"⚠️ Connection failed with code {reason_code}")
 
+
 # Callback when a message is received
 def on_message(client, userdata, msg):
-    message = msg.payload.decode()
-    print(f"📩 Received command: {message} on topic {msg.topic}")
-
-# Assign callbacks
-client.on_connect = on_connect
-client.on_message = on_message
-
-# Connect to MQTT broker
-client.connect(BROKER, PORT, 60)
-client.loop_start()  # Start MQTT loop in the background
-
-# Publish telemetry message every second
-while True:
-    counter += 1
-    telemetry_message = f"Telemetry Data - Counter: {counter}"
-    client.publish(PUBLISH_TOPIC, telemetry_message)
-    print(f"📤 Published: {telemetry_message} to {PUBLISH_TOPIC}")
-    time.sleep(1)  # Wait for 1 second before sending the next message
+    if command_link is not None:
+        command_link.submit(msg.payload)
+
+
+def serial_loop(ser, publisher, link, stats_interval=0.0, archive=None):
+    """Stream frames from the serial port to MQTT (and an optional ArchiveWriter) until interrupted."""
+    monitor = LinkQualityMonitor()
+    deframer = CCSDS_Deframer(monitor)
+    next_report = time.monotonic() + stats_interval
+    while True:
+        if stats_interval and time.monotonic() >= next_report:
+            print(f"📊 Link quality: {monitor.report()}")
+            next_report += stats_interval
+        link.poll()
+        chunk = ser.read(ser.in_waiting or 1)
+        if not chunk:
+            continue
+        received = time.time()
+        for valid, frame in deframer.feed(chunk):
+            link.on_frame(valid, frame)
+            if valid:
+                publisher.put_frame(frame, received)
+                if archive is not None:
+                    archive.write(frame)
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    profiler = profile_from_args(args)
+    if profiler:
+        profiler.instrument(PublishQueue, "put_frame", "mqtt queue")
+        profiler.instrument(CommandLink, "poll", "command poll")
+        profiler.instrument(SimulatedDevice, "read", "simulated read")
+        profiler.instrument(ArchiveWriter, "write", "archive")
+
+    # Create MQTT client (New API)
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, userdata=args.qos)
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(args.broker, args.port, 60)
+
+    publisher = PublishQueue(client, maxsize=args.queue_size, policy=args.queue_policy, qos=args.qos,
+                             batch_size=args.batch_size, batch_interval=args.batch_interval)
+    archive = ArchiveWriter(args.archive) if args.archive else None
+    try:
+        if args.serial:
+            import serial
+            ser = serial.Serial(port=args.serial, baudrate=args.baud, timeout=0.1)
+        else:
+            ser = SimulatedDevice(args.simulate or 1.0, args.apid)
+        command_link = CommandLink(ser, client, qos=args.qos, max_outstanding=args.max_outstanding,
+                                   response_timeout=args.response_timeout, match=args.match)
+        client.loop_start()  # Start MQTT loop in the background
+        serial_loop(ser, publisher, command_link, args.stats, archive)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        publisher.close()
+        if archive is not None:
+            archive.close()
+            if archive.dropped_frames:
+                print(f"⚠️ Archive fell behind: dropped {archive.dropped_frames} frames "
+                      f"in {archive.dropped_blocks} blocks")
+        client.loop_stop()
+        print(f"📤 Published {publisher.published} messages, dropped {publisher.dropped} frames")
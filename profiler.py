@@ -0,0 +1,213 @@
+import array
+import atexit
+import builtins
+import random
+import sys
+import threading
+import time
+
+
+class StageProfiler:
+    """
+    Per-stage wall-clock timers for the TM/TC pipeline.
+
+    Stages are timed by replacing functions with thin wrappers, and only
+    when profiling is enabled, so a normal run executes the original
+    functions untouched. Nested stages are tracked per thread: the report
+    shows inclusive times, the collapsed-stack output self times. Stages
+    run on several threads at once (main loop, router workers, the MQTT
+    network thread), so the totals are updated under a lock.
+    """
+
+    def __init__(self, max_samples=100000):
+        """
+        Args:
+            max_samples (int): Durations kept per stage for the percentiles;
+                beyond that a uniform reservoir sample is kept.
+        """
+        self.max_samples = max_samples
+        self.calls = {}      # stage -> number of calls
+        self.totals = {}     # stage -> total ns
+        self.samples = {}    # stage -> array of ns durations
+        self.collapsed = {}  # "outer;inner" -> self ns
+        self.patched = []    # (owner, attribute, original)
+        self.start = time.perf_counter_ns()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _record(self, stage, path, elapsed, self_time):
+        with self._lock:
+            calls = self.calls.get(stage, 0) + 1
+            self.calls[stage] = calls
+            self.totals[stage] = self.totals.get(stage, 0) + elapsed
+            self.collapsed[path] = self.collapsed.get(path, 0) + self_time
+            samples = self.samples.get(stage)
+            if samples is None:
+                samples = self.samples[stage] = array.array("q")
+            if len(samples) < self.max_samples:
+                samples.append(elapsed)
+            else:
+                i = random.randrange(calls)
+                if i < self.max_samples:
+                    samples[i] = elapsed
+
+    def wrap(self, fn, stage):
+        """Return fn wrapped with a timer for `stage`."""
+        local = self._local
+        clock = time.perf_counter_ns
+        record = self._record
+
+        def timed(*args, **kwargs):
+            try:
+                stack = local.stack
+            except AttributeError:
+                stack = local.stack = []
+            path = f"{stack[-1][0]};{stage}" if stack else stage
+            entry = [path, 0]  # path, time spent in nested stages
+            stack.append(entry)
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                stack.pop()
+                if stack:
+                    stack[-1][1] += elapsed
+                record(stage, path, elapsed, elapsed - entry[1])
+
+        timed.__wrapped__ = fn
+        timed.__name__ = getattr(fn, "__name__", stage)
+        return timed
+
+    def instrument(self, owner, attribute, stage=None):
+        """
+        Replace owner.attribute (a function, method, static method or any
+        callable) with a timed wrapper.
+
+        Args:
+            owner: Module, class or instance.
+            attribute (str): Name of the callable.
+            stage (str): Stage name (default: owner.attribute).
+        """
+        stage = stage or f"{getattr(owner, '__name__', type(owner).__name__)}.{attribute}"
+        original = owner.__dict__.get(attribute) if isinstance(owner, type) else getattr(owner, attribute)
+        if isinstance(original, staticmethod):
+            replacement = staticmethod(self.wrap(original.__func__, stage))
+        elif isinstance(original, classmethod):
+            replacement = classmethod(self.wrap(original.__func__, stage))
+        else:
+            replacement = self.wrap(original if original is not None else getattr(owner, attribute), stage)
+        setattr(owner, attribute, replacement)
+        self.patched.append((owner, attribute, original))
+        return replacement
+
+    def instrument_print(self, module, stage="output (print)"):
+        """
+        Time the print() calls made from one module (its per-frame output)
+        by shadowing the builtin in that module only; every other print,
+        including this profiler's report, stays untimed.
+        """
+        if "print" in vars(module):
+            return self.instrument(module, "print", stage)
+        replacement = self.wrap(builtins.print, stage)
+        module.print = replacement
+        self.patched.append((module, "print", None))  # restore() deletes the shadow
+        return replacement
+
+    def restore(self):
+        """Put every instrumented callable back."""
+        for owner, attribute, original in reversed(self.patched):
+            if original is None:
+                delattr(owner, attribute)  # was inherited
+            else:
+                setattr(owner, attribute, original)
+        self.patched.clear()
+
+    def stats(self):
+        """Returns [(stage, calls, total ns, p50 ns, p99 ns)] sorted by total time."""
+        with self._lock:
+            totals = [(stage, self.calls[stage], total, sorted(self.samples[stage]))
+                      for stage, total in self.totals.items()]
+        rows = []
+        for stage, calls, total, samples in totals:
+            p50 = samples[len(samples) // 2]
+            p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+            rows.append((stage, calls, total, p50, p99))
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def report(self, file=None):
+        file = file or sys.stderr
+        wall = time.perf_counter_ns() - self.start
+        print(f"\nStage profile ({wall / 1e9:.3f}s wall clock, times inclusive of nested stages):", file=file)
+        print(f"{'stage':<32}{'calls':>10}{'total ms':>12}{'% wall':>8}{'p50 µs':>10}{'p99 µs':>10}", file=file)
+        for stage, calls, total, p50, p99 in self.stats():
+            print(f"{stage:<32}{calls:>10}{total / 1e6:>12.2f}{100 * total / wall:>8.1f}"
+                  f"{p50 / 1e3:>10.1f}{p99 / 1e3:>10.1f}", file=file)
+
+    def write_collapsed(self, path):
+        """Write self times in collapsed-stack format (flamegraph.pl, speedscope), in µs."""
+        with self._lock:
+            collapsed = sorted(self.collapsed.items())
+        with open(path, "w") as f:
+            for stack, ns in collapsed:
+                if ns >= 1000:
+                    f.write(f"{stack} {ns // 1000}\n")
+
+    def report_at_exit(self, collapsed_path=None):
+        def finish():
+            self.report()
+            if collapsed_path:
+                self.write_collapsed(collapsed_path)
+                print(f"Collapsed stacks written to {collapsed_path}", file=sys.stderr)
+        atexit.register(finish)
+
+
+def profile_pipeline(profiler):
+    """
+    Instrument the shared pipeline stages: serial I/O, sync search and
+    deframing, CRC, header decode, telemetry formatting, routing and the
+    output printed by ccsds_pkg and tm. Scripts add their own output with
+    instrument_print(sys.modules[__name__]).
+    """
+    import ccsds_pkg
+    import router
+    import tm
+    try:
+        import serial
+        for method in ("read", "readline", "write"):
+            profiler.instrument(serial.Serial, method, f"serial.{method}")
+    except ImportError:
+        pass
+    profiler.instrument(ccsds_pkg, "_crc32", "crc32")
+    profiler.instrument(ccsds_pkg.CCSDS_Packet, "get_packet", "get_packet (sync + read)")
+    profiler.instrument(ccsds_pkg.CCSDS_Deframer, "feed", "deframe (sync search)")
+    profiler.instrument(ccsds_pkg.CCSDS_Packet, "from_bytes", "header decode")
+    profiler.instrument(ccsds_pkg.CCSDS_Packet, "from_frame", "header decode")
+    profiler.instrument(ccsds_pkg.CCSDS_Packet, "to_bytes", "encode")
+    profiler.instrument(tm.Telemetery, "parse", "Telemetery.parse")
+    profiler.instrument(tm.Telemetery, "channels", "Telemetery.channels")
+    profiler.instrument(router.PacketRouter, "route", "route")
+    profiler.instrument_print(ccsds_pkg)
+    profiler.instrument_print(tm)
+
+
+def add_profile_arguments(parser):
+    parser.add_argument("--profile", action="store_true",
+                        help="Time each pipeline stage and print a breakdown on exit")
+    parser.add_argument("--profile-stacks", metavar="FILE",
+                        help="With --profile, also write collapsed stacks for flamegraphs to FILE")
+
+
+def profile_from_args(args):
+    """
+    Start profiling if --profile was given.
+
+    Returns:
+        StageProfiler: The profiler, or None when profiling is off.
+    """
+    if not args.profile:
+        return None
+    profiler = StageProfiler()
+    profile_pipeline(profiler)
+    profiler.report_at_exit(args.profile_stacks)
+    return profiler
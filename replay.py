@@ -0,0 +1,273 @@
+import argparse
+import os
+import socket
+import sys
+import time
+import zlib
+
+from ccsds_pkg import CCSDS_Deframer
+from layout import (CRC_LEN, FRAME_HEADER_LEN, SECONDARY, SEQUENCE_MODULO, SYNC_BYTES, TIMING_LEN, TIMING_OFFSET,
+                    frame_apid, frame_sequence)
+
+
+def load_frames(file_path):
+    """
+    Read the frames of a capture file.
+
+    A capture is frames back to back with their sync words. tmtc.py's
+    abc.bin holds one response without its sync word, which is accepted too.
+
+    Returns:
+        list: Frames (bytes, sync word included) that passed their CRC.
+    """
+    with open(file_path, "rb") as f:
+        data = f.read()
+    if data and not data.startswith(b"\x55\xAA"):
+        data = b"\x55\xAA" + data
+    return [frame for valid, frame in CCSDS_Deframer().feed(data) if valid]
+
+
+def load_archive(path, t0=None, t1=None):
+    """
+    Read frames from an archive segment (archive.py), optionally a time range.
+
+    Returns:
+        tuple: (frames, offsets) with offsets from the receive time stamps.
+    """
+    from archive import ArchiveReader
+    stamped = list(ArchiveReader(path).query(t0, t1))
+    if not stamped:
+        return [], []
+    first = stamped[0][0]
+    return [frame for _, frame in stamped], [(ts - first) / 1e6 for ts, _ in stamped]
+
+
+def frame_offsets(frames, default_interval=0.1):
+    """
+    Inter-arrival schedule from each frame's 48-bit timing_info (µs).
+
+    Falls back to `default_interval` spacing for frames whose time code is
+    zero or goes backwards.
+
+    Returns:
+        list: Seconds since the first frame, one entry per frame.
+    """
+    offsets = []
+    first = last = None
+    offset = 0.0
+    for frame in frames:
+        timing = int.from_bytes(frame[TIMING_OFFSET:TIMING_OFFSET + TIMING_LEN], "big")
+        if timing and last is not None and timing >= last:
+            offset += (timing - last) / 1e6
+        elif offsets:
+            offset += default_interval
+        if timing:
+            last = timing
+        offsets.append(offset)
+    return offsets
+
+
+def restamp(frame, sequence_number, timing):
+    """Return a copy of `frame` with a new sequence count and time code, CRC recomputed."""
+    out = bytearray(frame)
+    header = SECONDARY.decode(out, SYNC_BYTES)._replace(sequence_number=sequence_number, timing_info=timing)
+    out[SYNC_BYTES:FRAME_HEADER_LEN] = SECONDARY.encode_record(header)
+    out[-CRC_LEN:] = (zlib.crc32(out[SYNC_BYTES:-CRC_LEN]) & 0xFFFFFFFF).to_bytes(CRC_LEN, "big")
+    return bytes(out)
+
+
+class ReplayEngine:
+    """
+    Plays frames into a target with their original spacing scaled by `speed`.
+
+    Frames due within `lookahead` seconds of each other are sent as one
+    batch after a single wait, so high speed factors are not limited by
+    per-frame sleep overhead. Waits are absolute (against the start time),
+    so timing errors don't accumulate. speed=0 sends as fast as possible.
+    """
+
+    def __init__(self, frames, offsets, target, speed=1.0, loop=False, restamp=False, lookahead=0.002):
+        """
+        Args:
+            frames (list): Frames to replay.
+            offsets (list): Seconds since the first frame, per frame.
+            target (callable): Called with a list of frames per batch.
+            speed (float): Playback speed factor, 0 for as fast as possible.
+            loop (bool): Start over after the last frame until stopped.
+            restamp (bool): Rewrite sequence counts and time codes as if live.
+        """
+        self.frames = frames
+        self.offsets = offsets
+        self.target = target
+        self.speed = speed
+        self.loop = loop
+        self.restamp = restamp
+        self.lookahead = lookahead
+        self.sequence = {}  # apid -> next sequence count when restamping
+        self.sent = 0
+        self.batches = 0
+        self.running = False
+
+    def _stamp(self, frame):
+        apid = frame_apid(frame)
+        seq = self.sequence.get(apid, frame_sequence(frame))
+        self.sequence[apid] = (seq + 1) % SEQUENCE_MODULO
+        return restamp(frame, seq, int(time.time() * 1e6))
+
+    @staticmethod
+    def _wait_until(deadline):
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return
+            # sleep most of the way, then spin for sub-millisecond accuracy
+            time.sleep(remaining - 0.001 if remaining > 0.002 else 0)
+
+    def run(self):
+        if not self.frames:
+            return
+        self.running = True
+        n = len(self.frames)
+        # one nominal gap between the end of a pass and the start of the next
+        period = self.offsets[-1] + (self.offsets[-1] / (n - 1) if n > 1 else 0.1)
+        start = time.perf_counter()
+        base = 0.0
+        while self.running:
+            i = 0
+            while i < n and self.running:
+                if self.speed > 0:
+                    due = (base + self.offsets[i]) / self.speed
+                    j = i + 1
+                    while j < n and (base + self.offsets[j]) / self.speed <= due + self.lookahead:
+                        j += 1
+                    self._wait_until(start + due)
+                else:
+                    j = min(n, i + 256)
+                batch = self.frames[i:j]
+                if self.restamp:
+                    batch = [self._stamp(frame) for frame in batch]
+                self.target(batch)
+                self.sent += len(batch)
+                self.batches += 1
+                i = j
+            if not self.loop:
+                break
+            base += period
+        self.running = False
+
+    def stop(self):
+        self.running = False
+
+
+def handler_target(handler):
+    """Target calling handler(frame) for every frame, e.g. a PacketRouter.route."""
+    def target(batch):
+        for frame in batch:
+            handler(frame)
+    return target
+
+
+class StreamTarget:
+    """Writes each batch to a file descriptor-like object with write()."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __call__(self, batch):
+        self.stream.write(b"".join(batch))
+
+
+class TcpTarget:
+    def __init__(self, host, port):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def __call__(self, batch):
+        self.sock.sendall(b"".join(batch))
+
+
+class PtyTarget:
+    """Creates a pseudo-terminal; point tmtc/ui/uart_end at slave_name."""
+
+    def __init__(self):
+        import tty
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.slave = slave
+        self.slave_name = os.ttyname(slave)
+
+    def __call__(self, batch):
+        os.write(self.master, b"".join(batch))
+
+
+class MqttTarget:
+    """Publishes each frame on its per-APID telemetry topic."""
+
+    def __init__(self, client, qos=0):
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mqtt"))
+        from ccsds_mqtt import frame_apid, telemetry_topic
+        self._topic = lambda frame: telemetry_topic(frame_apid(frame))
+        self.client = client
+        self.qos = qos
+
+    def __call__(self, batch):
+        for frame in batch:
+            self.client.publish(self._topic(frame), frame, qos=self.qos)
+
+
+def make_target(spec):
+    """
+    Build a target from a command-line spec:
+    pty | serial:PORT[:BAUD] | tcp:HOST:PORT | mqtt:HOST[:PORT] | file:PATH
+    """
+    kind, _, rest = spec.partition(":")
+    if kind == "pty":
+        target = PtyTarget()
+        print(f"Replaying into pty {target.slave_name}")
+        return target
+    if kind == "serial":
+        import serial
+        port, _, baud = rest.partition(":")
+        return StreamTarget(serial.Serial(port=port, baudrate=int(baud or 115200)))
+    if kind == "tcp":
+        host, _, port = rest.rpartition(":")
+        return TcpTarget(host, int(port))
+    if kind == "mqtt":
+        import paho.mqtt.client as mqtt
+        host, _, port = rest.partition(":")
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        client.connect(host or "localhost", int(port or 1883), 60)
+        client.loop_start()
+        return MqttTarget(client)
+    if kind == "file":
+        return StreamTarget(open(rest, "wb"))
+    raise ValueError(f"Unknown replay target: {spec}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded CCSDS frames with their original timing")
+    parser.add_argument("file", help="Capture file (.bin) or archive segment (.seg)")
+    parser.add_argument("--to", default="pty", help="pty | serial:PORT[:BAUD] | tcp:HOST:PORT | mqtt:HOST[:PORT] | file:PATH")
+    parser.add_argument("--speed", type=float, default=1.0, help="Speed factor, 0 = as fast as possible")
+    parser.add_argument("--loop", action="store_true", help="Repeat until interrupted")
+    parser.add_argument("--restamp", action="store_true", help="Rewrite sequence counts and time codes")
+    parser.add_argument("--interval", type=float, default=0.1, help="Spacing for frames without a time code (s)")
+    args = parser.parse_args()
+
+    if args.file.endswith(".seg"):
+        frames, offsets = load_archive(args.file[:-len(".seg")])
+    else:
+        frames = load_frames(args.file)
+        offsets = frame_offsets(frames, args.interval)
+    if not frames:
+        print(f"No valid frames in {args.file}")
+        sys.exit(1)
+    engine = ReplayEngine(frames, offsets, make_target(args.to),
+                          speed=args.speed, loop=args.loop, restamp=args.restamp)
+    t0 = time.perf_counter()
+    try:
+        engine.run()
+    except KeyboardInterrupt:
+        engine.stop()
+    elapsed = time.perf_counter() - t0
+    print(f"Replayed {engine.sent} frames in {engine.batches} batches, {elapsed:.3f}s")
@@ -0,0 +1,120 @@
+import queue
+import threading
+
+from layout import FUNCTION_CODE_OFFSET, frame_apid
+
+MIN_ROUTE_LEN = FUNCTION_CODE_OFFSET + 1  # a frame must reach its function code to be routed
+
+
+class HandlerWorker:
+    """
+    Runs one packet handler on its own thread behind a bounded queue.
+
+    When the queue is full new frames are dropped (and counted) for this
+    handler only, so a slow consumer never holds up the router or the other
+    handlers.
+    """
+
+    def __init__(self, handler, name=None, queue_size=256):
+        self.handler = handler
+        self.name = name or getattr(handler, "__name__", repr(handler))
+        self.queue = queue.Queue(queue_size)
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.thread = threading.Thread(target=self._run, name=f"handler-{self.name}", daemon=True)
+        self.thread.start()
+
+    def put(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=None):
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def _run(self):
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                break
+            try:
+                self.handler(frame)
+                self.delivered += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Handler {self.name} failed: {e}")
+
+
+class PacketRouter:
+    """
+    Dispatches frames to handlers registered for (apid, function_code).
+
+    Either key part may be None to act as a wildcard. Only the APID and
+    function code bytes are read to route a frame; the resolved handler list
+    for each key seen is kept in a dispatch table, so routing is a single
+    dict lookup on the hot path.
+    """
+
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self.routes = {}   # (apid or None, function_code or None) -> [HandlerWorker]
+        self.workers = []
+        self.table = {}    # (apid, function_code) -> tuple of HandlerWorkers
+        self.unrouted = 0
+        self.lock = threading.Lock()
+
+    def register(self, handler, apid=None, function_code=None, name=None, queue_size=None):
+        """
+        Args:
+            handler (callable): Called as handler(frame) on the worker thread.
+            apid (int): APID to match, or None for any.
+            function_code (int): Function code to match, or None for any.
+        """
+        worker = HandlerWorker(handler, name, queue_size or self.queue_size)
+        with self.lock:
+            self.workers.append(worker)
+            self.routes.setdefault((apid, function_code), []).append(worker)
+            self.table = {}  # re-resolved lazily on the next frames
+        return worker
+
+    def _resolve(self, key):
+        apid, function_code = key
+        workers = []
+        for k in (key, (apid, None), (None, function_code), (None, None)):
+            for worker in self.routes.get(k, ()):
+                if worker not in workers:
+                    workers.append(worker)
+        return tuple(workers)
+
+    def route(self, frame):
+        """
+        Hand a frame (sync word included) to every matching handler.
+
+        Returns:
+            int: Number of handlers the frame was queued for.
+        """
+        if len(frame) < MIN_ROUTE_LEN:
+            self.unrouted += 1
+            return 0
+        key = (frame_apid(frame), frame[FUNCTION_CODE_OFFSET])
+        workers = self.table.get(key)
+        if workers is None:
+            with self.lock:
+                workers = self.table[key] = self._resolve(key)
+        if not workers:
+            self.unrouted += 1
+        for worker in workers:
+            worker.put(frame)
+        return len(workers)
+
+    def stats(self):
+        return {w.name: {"delivered": w.delivered, "dropped": w.dropped, "errors": w.errors,
+                         "queued": w.queue.qsize()} for w in self.workers}
+
+    def close(self, timeout=None):
+        """Let every handler finish its queue, then stop the workers."""
+        for worker in self.workers:
+            worker.close(timeout)
@@ -0,0 +1,203 @@
+import argparse
+import collections
+import struct
+import time
+from multiprocessing import shared_memory
+
+# Shared memory layout:
+#   header | index slots | data area
+# header:  magic, slot count, data capacity, pad, write sequence, write position
+# slot:    sequence, absolute data position, length, host timestamp
+# Positions are absolute byte counts that only grow; the byte offset in the
+# data area is position % capacity. A frame never wraps: if it does not fit
+# before the end of the data area, the writer skips to the start.
+# The write sequence and position change on every frame and are read by
+# other processes without a lock, so they sit 8-byte aligned and are only
+# accessed through a native "Q" memoryview: each update is a single aligned
+# 64-bit store that a reader can never see half written.
+MAGIC = b"CCR2"
+HEADER = struct.Struct("<4sII4x")
+WRITE_SEQ = 2  # index of the write sequence in the header's "Q" words
+WRITE_POS = 3  # index of the write position
+SLOT = struct.Struct("<QQdI4x")
+HEADER_SIZE = 64
+
+RingRecord = collections.namedtuple("RingRecord", "seq timestamp pos data")
+
+
+class ShmRingWriter:
+    """
+    Single producer side of the frame ring. The process that owns the serial
+    port writes every frame once; any number of ShmRingReader processes read
+    it in place.
+    """
+
+    def __init__(self, name, slots=4096, capacity=1 << 20):
+        size = HEADER_SIZE + slots * SLOT.size + capacity
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.slots = slots
+        self.capacity = capacity
+        self.data_start = HEADER_SIZE + slots * SLOT.size
+        self.write_seq = 0
+        self.write_pos = 0
+        self.words = self.shm.buf[:HEADER_SIZE].cast("Q")
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, self.slots, self.capacity)
+        self._publish()
+
+    def _publish(self):
+        self.words[WRITE_POS] = self.write_pos
+        self.words[WRITE_SEQ] = self.write_seq
+
+    def write(self, frame, timestamp=None):
+        """
+        Append one frame.
+
+        Args:
+            frame (bytes): Raw CCSDS frame.
+            timestamp (float): Host receive time, defaults to now.
+        """
+        n = len(frame)
+        if n > self.capacity:
+            raise ValueError(f"Frame of {n} bytes does not fit a {self.capacity} byte ring.")
+        pos = self.write_pos
+        offset = pos % self.capacity
+        if offset + n > self.capacity:
+            pos += self.capacity - offset
+            offset = 0
+        # Announce the new write position before touching the data, so a
+        # reader checking afterwards can tell its bytes were overwritten.
+        self.write_pos = pos + n
+        self._publish()
+        start = self.data_start + offset
+        self.shm.buf[start:start + n] = frame
+        SLOT.pack_into(self.shm.buf, HEADER_SIZE + (self.write_seq % self.slots) * SLOT.size,
+                       self.write_seq, pos, time.time() if timestamp is None else timestamp, n)
+        self.write_seq += 1
+        self._publish()
+
+    def close(self):
+        self.words.release()
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ShmRingReader:
+    """
+    One consumer of the frame ring, reading at its own pace.
+
+    read() returns a memoryview into shared memory rather than a copy. The
+    view is only trustworthy while intact(record) is True; a consumer that
+    falls a full ring behind skips ahead and counts the lost frames
+    in `overruns`.
+    """
+
+    def __init__(self, name, from_start=False):
+        # Attaching must not make this process responsible for unlinking the
+        # segment when it exits; only the writer owns it.
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+        except TypeError:
+            self.shm = shared_memory.SharedMemory(name=name)
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+            except Exception:
+                pass
+        magic, self.slots, self.capacity = HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Shared memory '{name}' is not a frame ring.")
+        self.words = self.shm.buf[:HEADER_SIZE].cast("Q")
+        write_seq = self.words[WRITE_SEQ]
+        self.data_start = HEADER_SIZE + self.slots * SLOT.size
+        self.next_seq = max(0, write_seq - self.slots + 1) if from_start else write_seq
+        self.overruns = 0
+        self.frames = 0
+
+    def _write_state(self):
+        return self.words[WRITE_SEQ], self.words[WRITE_POS]
+
+    def intact(self, record):
+        """True while the writer has not started overwriting the record's bytes."""
+        return self._write_state()[1] - record.pos <= self.capacity
+
+    def lag(self):
+        return self._write_state()[0] - self.next_seq
+
+    def read(self):
+        """
+        Returns:
+            RingRecord: The next frame, or None if the reader is caught up.
+        """
+        while True:
+            write_seq, _ = self._write_state()
+            if self.next_seq >= write_seq:
+                return None
+            # The writer fills slot write_seq % slots before publishing
+            # write_seq, so a reader a full ring behind is looking at the slot
+            # being rewritten: skip to the oldest slot that is settled.
+            if write_seq - self.next_seq >= self.slots:
+                self.overruns += write_seq - self.slots + 1 - self.next_seq
+                self.next_seq = write_seq - self.slots + 1
+            slot_offset = HEADER_SIZE + (self.next_seq % self.slots) * SLOT.size
+            seq, pos, timestamp, n = SLOT.unpack_from(self.shm.buf, slot_offset)
+            # Seqlock-style re-check: if the writer reached this slot while we
+            # unpacked it, the fields may mix two frames.
+            if seq != self.next_seq or self._write_state()[0] - self.next_seq >= self.slots:
+                self.overruns += 1
+                self.next_seq += 1
+                continue
+            start = self.data_start + pos % self.capacity
+            record = RingRecord(seq, timestamp, pos, self.shm.buf[start:start + n])
+            self.next_seq += 1
+            if not self.intact(record):
+                record.data.release()
+                self.overruns += 1
+                continue
+            self.frames += 1
+            return record
+
+    def close(self):
+        self.words.release()
+        self.shm.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Share CCSDS frames from one serial port with other processes")
+    parser.add_argument("name", help="Shared memory name")
+    parser.add_argument("--serial", help="Own this serial port and publish its frames")
+    parser.add_argument("--baud", type=int, default=115200)
+    parser.add_argument("--slots", type=int, default=4096, help="Index records in the ring")
+    parser.add_argument("--capacity", type=int, default=1 << 20, help="Data area size in bytes")
+    args = parser.parse_args()
+
+    if args.serial:
+        import serial
+        from ccsds_pkg import CCSDS_Deframer
+
+        writer = ShmRingWriter(args.name, args.slots, args.capacity)
+        deframer = CCSDS_Deframer()
+        try:
+            with serial.Serial(port=args.serial, baudrate=args.baud, timeout=0.1) as ser:
+                while True:
+                    for valid, frame in deframer.feed(ser.read(ser.in_waiting or 1)):
+                        if valid:
+                            writer.write(frame)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            writer.close()
+    else:
+        reader = ShmRingReader(args.name)
+        try:
+            while True:
+                record = reader.read()
+                if record is None:
+                    time.sleep(0.01)
+                    continue
+                print(f"#{record.seq} {len(record.data)} bytes: {record.data[:8].hex(' ').upper()} ... "
+                      f"(lag {reader.lag()}, overruns {reader.overruns})")
+                record.data.release()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            reader.close()
@@ -0,0 +1,237 @@
+import time
+
+import numpy as np
+
+from layout import TIMING_LEN, TIMING_OFFSET
+
+TIME_CODE_BYTES = TIMING_LEN
+UNIX_EPOCH = np.datetime64("1970-01-01T00:00:00", "ns")
+# TAI - UTC since 2017-01-01; a fixed offset, so TAI conversions of earlier
+# times are off by the leap seconds inserted since
+TAI_UTC = 37
+
+
+class TimeCode:
+    """
+    Interpretation of the 48-bit timing_info field.
+
+    Either a plain counter of `resolution` seconds (the default: µs since
+    the Unix epoch, as written by from_file and uart_end), or CUC-style
+    with `coarse_bytes` of whole seconds followed by `fine_bytes` of binary
+    fraction. Counters wrap at 48 bits (µs every ~8.9 years), so
+    conversions take a host reference time to pick the right wrap.
+
+    All conversions accept scalars or arrays and are vectorized. Unix and
+    datetime64 results are UTC; a time code on a continuous scale such as
+    TAI is converted with its fixed `utc_offset`.
+    """
+
+    def __init__(self, epoch="1970-01-01", resolution=1e-6, coarse_bytes=None, fine_bytes=0, utc_offset=0):
+        """
+        Args:
+            epoch (str): ISO date/time the time code counts from.
+            resolution (float): Seconds per count (counter format).
+            coarse_bytes (int): Bytes of whole seconds (CUC format); the
+                remaining fine_bytes hold the binary fraction.
+            fine_bytes (int): Bytes of binary fraction (CUC format).
+            utc_offset (int): Seconds the time code's scale is ahead of UTC
+                (TAI_UTC for TAI).
+        """
+        self.epoch = np.datetime64(epoch, "ns")
+        self.utc_offset = utc_offset
+        # UTC instant the count starts from, and the same in Unix seconds
+        self.utc_epoch = self.epoch - np.timedelta64(int(utc_offset * 1e9), "ns")
+        self.epoch_offset = (self.utc_epoch - UNIX_EPOCH) / np.timedelta64(1, "s")
+        if coarse_bytes is not None:
+            if coarse_bytes + fine_bytes != TIME_CODE_BYTES:
+                raise ValueError("CUC coarse + fine bytes must add up to 6.")
+            resolution = 2.0 ** (-8 * fine_bytes)
+        self.coarse_bytes = coarse_bytes
+        self.fine_bytes = fine_bytes
+        self.resolution = resolution
+        self.modulus = 1 << (8 * TIME_CODE_BYTES)
+        # exact integer nanoseconds per count where possible, for datetime64
+        self._ns_per_count = round(resolution * 1e9) if coarse_bytes is None and resolution >= 1e-9 else None
+
+    def from_frames(self, frames):
+        """
+        Raw 48-bit codes of many frames at once.
+
+        Args:
+            frames: List of frames (sync word included), or an (n, length)
+                uint8 array of equal-length frames.
+
+        Returns:
+            ndarray: uint64 codes.
+        """
+        if isinstance(frames, np.ndarray):
+            raw = frames[:, TIMING_OFFSET:TIMING_OFFSET + TIME_CODE_BYTES]
+        else:
+            raw = np.frombuffer(b"".join(bytes(f[TIMING_OFFSET:TIMING_OFFSET + TIME_CODE_BYTES]) for f in frames),
+                                dtype=np.uint8).reshape(-1, TIME_CODE_BYTES)
+        return self.from_bytes(raw)
+
+    @staticmethod
+    def from_bytes(raw):
+        """(n, 6) uint8 big-endian time codes -> uint64 codes."""
+        raw = np.asarray(raw, dtype=np.uint8).reshape(-1, TIME_CODE_BYTES)
+        padded = np.zeros((len(raw), 8), dtype=np.uint8)
+        padded[:, 2:] = raw
+        return padded.view(">u8").ravel().astype(np.uint64)
+
+    def to_bytes(self, codes):
+        """uint64 codes -> (n, 6) uint8, big-endian."""
+        codes = np.atleast_1d(np.asarray(codes, dtype=np.uint64)) & np.uint64(self.modulus - 1)
+        return codes.astype(">u8").view(np.uint8).reshape(-1, 8)[:, 2:]
+
+    def unwrap(self, codes, reference):
+        """
+        Resolve the 48-bit wrap: the full count closest to `reference`.
+
+        Args:
+            codes: Raw codes.
+            reference: Host time(s) in Unix seconds, e.g. the receive time.
+
+        Returns:
+            ndarray: int64 full counts since the epoch.
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        ref = np.rint((np.asarray(reference, dtype=np.float64) - self.epoch_offset) / self.resolution).astype(np.int64)
+        return ref - ((ref - codes + self.modulus // 2) % self.modulus - self.modulus // 2)
+
+    def to_seconds(self, codes):
+        """Codes -> seconds since the time code epoch (float64)."""
+        codes = np.asarray(codes)
+        if self.coarse_bytes is not None:
+            shift = 8 * self.fine_bytes
+            coarse = (codes.astype(np.uint64) >> np.uint64(shift)).astype(np.float64)
+            fine = (codes.astype(np.uint64) & np.uint64((1 << shift) - 1)).astype(np.float64)
+            return coarse + fine * self.resolution
+        return codes.astype(np.float64) * self.resolution
+
+    def to_epoch(self, codes, reference=None):
+        """
+        Codes -> Unix time in seconds (float64).
+
+        Args:
+            codes: Raw codes.
+            reference: Host time(s) used to unwrap counters; omit for
+                formats that do not wrap within the mission (e.g. CUC).
+        """
+        if reference is not None and self.coarse_bytes is None:
+            codes = self.unwrap(codes, reference)
+        return self.to_seconds(codes) + self.epoch_offset
+
+    def to_datetime64(self, codes, reference=None):
+        """Codes -> UTC datetime64[ns], exact for integer-nanosecond counters."""
+        if reference is not None and self.coarse_bytes is None:
+            codes = self.unwrap(codes, reference)
+        if self._ns_per_count is not None:
+            return self.utc_epoch + np.asarray(codes, dtype=np.int64) * np.timedelta64(self._ns_per_count, "ns")
+        ns = np.rint(self.to_seconds(codes) * 1e9).astype(np.int64)
+        return self.utc_epoch + ns.astype("timedelta64[ns]")
+
+    def from_epoch(self, t):
+        """Unix time(s) in seconds -> raw codes (uint64, wrapped to 48 bits)."""
+        seconds = np.asarray(t, dtype=np.float64) - self.epoch_offset
+        if self.coarse_bytes is not None:
+            shift = 8 * self.fine_bytes
+            coarse = np.floor(seconds)
+            fine = np.minimum(np.rint((seconds - coarse) / self.resolution), (1 << shift) - 1)
+            codes = (coarse.astype(np.uint64) << np.uint64(shift)) | fine.astype(np.uint64)
+        else:
+            codes = np.rint(seconds / self.resolution).astype(np.int64) % self.modulus
+        return np.asarray(codes, dtype=np.uint64) & np.uint64(self.modulus - 1)
+
+    def now(self):
+        """Current host time as a raw code (int), e.g. for set_timing_info()."""
+        return int(self.from_epoch(time.time()))
+
+
+# µs counter since 1970, as written by from_file ("?") and uart_end
+UNIX_US = TimeCode()
+# CCSDS unsegmented time code: 4 bytes of TAI seconds since 1958 + 2 bytes of fraction
+CUC_4_2 = TimeCode(epoch="1958-01-01", coarse_bytes=4, fine_bytes=2, utc_offset=TAI_UTC)
+
+
+class ClockCorrelator:
+    """
+    Estimates the on-board clock's offset and drift against host receive time.
+
+    Pairs of (time code, host receive time) are kept in a sliding window
+    and fitted with a straight line: host = offset + rate * onboard. The
+    offset includes the mean link latency; the rate gives the drift.
+    """
+
+    def __init__(self, timecode=UNIX_US, window=1000):
+        self.timecode = timecode
+        self.window = window
+        self.onboard = np.empty(0)
+        self.host = np.empty(0)
+        self.rate = 1.0
+        self.offset = 0.0
+
+    def add(self, codes, host_times):
+        """Add one or many (time code, host receive time in Unix seconds) pairs."""
+        host_times = np.atleast_1d(np.asarray(host_times, dtype=np.float64))
+        onboard = np.atleast_1d(self.timecode.to_epoch(codes, host_times))
+        self.onboard = np.concatenate([self.onboard, onboard])[-self.window:]
+        self.host = np.concatenate([self.host, host_times])[-self.window:]
+
+    def fit(self):
+        """
+        Refit the correlation.
+
+        Returns:
+            tuple: (offset in seconds at the newest sample, drift in ppm)
+        """
+        if len(self.onboard) < 2:
+            return None
+        # fit relative to the first sample to keep the numbers well conditioned
+        x0, y0 = self.onboard[0], self.host[0]
+        slope, intercept = np.polyfit(self.onboard - x0, self.host - y0, 1)
+        self.rate = slope
+        self.offset = y0 + intercept - slope * x0
+        return self.host_time(self.onboard[-1]) - self.onboard[-1], (slope - 1.0) * 1e6
+
+    def host_time(self, onboard_epoch):
+        """Map on-board time (Unix seconds) to host time with the current fit."""
+        return self.offset + self.rate * np.asarray(onboard_epoch, dtype=np.float64)
+
+    def residuals(self):
+        """Host minus fitted time per pair; the spread shows link latency jitter."""
+        return self.host - self.host_time(self.onboard)
+
+
+class TimeIndex:
+    """
+    Sorted time index over a batch of frames or samples, for time-range
+    archive and plot queries by on-board time.
+    """
+
+    def __init__(self, times):
+        """
+        Args:
+            times: Unix seconds per item (e.g. from TimeCode.to_epoch()).
+        """
+        times = np.asarray(times, dtype=np.float64)
+        self.order = np.argsort(times, kind="stable")
+        self.times = times[self.order]
+
+    @classmethod
+    def from_frames(cls, frames, timecode=UNIX_US, reference=None):
+        """Index frames by their time codes (reference: host time for unwrapping)."""
+        return cls(timecode.to_epoch(timecode.from_frames(frames), reference))
+
+    def range(self, t0=None, t1=None):
+        """Item indices with t0 <= time <= t1, in time order."""
+        lo = 0 if t0 is None else np.searchsorted(self.times, t0, side="left")
+        hi = len(self.times) if t1 is None else np.searchsorted(self.times, t1, side="right")
+        return self.order[lo:hi]
+
+    def nearest(self, t):
+        """Index of the item closest in time to t."""
+        i = int(np.clip(np.searchsorted(self.times, t), 1, len(self.times) - 1)) if len(self.times) > 1 else 0
+        if i and abs(self.times[i - 1] - t) <= abs(self.times[i] - t):
+            i -= 1
+        return int(self.order[i])
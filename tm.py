@@ -35,7 +35,38 @@ annotations = [
 def get_annotation(index, value):
     return annotations[index % len(annotations)](value)
 
+# ADC channel table: (name, engineering units per raw count, low, high, unit)
+# Scales are linear so they apply equally to single values and NumPy arrays.
+CHANNELS = [
+    ("v28",  28.0 / 4095,      1.000, 3.000,  "V"),
+    ("i28",  28.0 / 4095,      0.5,   1.5,    "A"),
+    ("v5",   5.0 / 4095,       4.75,  5.25,   "V"),
+    ("i5",   5.0 / 4095,       0.5,   1.5,    "A"),
+    ("vn5",  -5.0 / 4095,      -5.25, -4.75,  "V"),
+    ("in5",  5.0 / 4095,       0.5,   1.5,    "A"),
+    ("temp", 1.0 / 128,        0,     20,     "°C"),
+    ("vcc",  3.3 * 2 / 4095,   3.00,  3.80,   "V"),
+]
+CHANNEL_NAMES = [c[0] for c in CHANNELS]
+
+def calibrate(index, raw):
+    """Convert raw ADC counts (int or NumPy array) of channel `index` to engineering units."""
+    return raw * CHANNELS[index % len(CHANNELS)][1]
+
 class Telemetery:
+    @staticmethod
+    def channels(ccsds_pkt):
+        """
+        Decode the ADC words of a packet without printing.
+
+        Returns:
+            list: (name, raw, engineering value) per channel.
+        """
+        user_data = ccsds_pkt.data
+        num_chunks = len(user_data) // 2
+        adc_values = struct.unpack(f'>{num_chunks}H', user_data[:num_chunks * 2])
+        return [(CHANNELS[i % len(CHANNELS)][0], v, calibrate(i, v)) for i, v in enumerate(adc_values)]
+
     @staticmethod
     def parse( ccsds_pkt):
         user_data = ccsds_pkt.data
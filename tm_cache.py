@@ -0,0 +1,190 @@
+import threading
+import time
+
+import numpy as np
+
+from tm import Telemetery
+
+EMPTY_STATS = {"count": 0, "min": None, "max": None, "mean": None}
+
+
+class ChannelRing:
+    """
+    Fixed-capacity time series for one telemetry channel.
+
+    The ring has one spare slot beyond `capacity`, and every sample is
+    written twice, at slot i and slot i + slots, so the most recent
+    `capacity` samples are always one contiguous slice that never includes
+    the slot the next append writes. Queries therefore return NumPy views
+    into the buffer instead of copies, and appending is O(1) (or one
+    vectorized write for a batch).
+
+    Views from last() and since() stay valid until the writer wraps around
+    onto them; take a .copy() if the data has to outlive further appends.
+    stats() reduces the buffer, so it works under the lock.
+    """
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError(f"Channel ring capacity must be at least 1, not {capacity}.")
+        self.capacity = capacity
+        self.slots = capacity + 1  # the spare slot keeps the next write out of any view
+        self.t = np.zeros(2 * self.slots, dtype=np.float64)
+        self.raw = np.zeros(2 * self.slots, dtype=np.int64)
+        self.value = np.zeros(2 * self.slots, dtype=np.float64)
+        self.head = 0    # next slot to write, 0 <= head < slots
+        self.count = 0   # number of valid samples, <= capacity
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self.t.nbytes + self.raw.nbytes + self.value.nbytes
+
+    def append(self, t, raw, value):
+        with self.lock:
+            h = self.head
+            self.t[h] = self.t[h + self.slots] = t
+            self.raw[h] = self.raw[h + self.slots] = raw
+            self.value[h] = self.value[h + self.slots] = value
+            self.head = (h + 1) % self.slots
+            self.count = min(self.count + 1, self.capacity)
+
+    def extend(self, t, raw, value):
+        """Append arrays of samples (oldest first) with vectorized writes."""
+        t = np.asarray(t, dtype=np.float64)
+        n = len(t)
+        if n == 0:
+            return
+        raw = np.broadcast_to(np.asarray(raw, dtype=np.int64), (n,))
+        value = np.broadcast_to(np.asarray(value, dtype=np.float64), (n,))
+        if n > self.capacity:
+            t, raw, value = t[-self.capacity:], raw[-self.capacity:], value[-self.capacity:]
+            n = self.capacity
+        with self.lock:
+            idx = (self.head + np.arange(n)) % self.slots
+            for arr, src in ((self.t, t), (self.raw, raw), (self.value, value)):
+                arr[idx] = src
+                arr[idx + self.slots] = src
+            self.head = (self.head + n) % self.slots
+            self.count = min(self.count + n, self.capacity)
+
+    def _window(self, n=None, t0=None):
+        """
+        Slice covering the newest n samples, or those with timestamp >= t0.
+        Call with the lock held.
+        """
+        end = self.head + self.slots
+        start = end - self.count
+        if t0 is not None:
+            start += int(np.searchsorted(self.t[start:end], t0, side="left"))
+        elif n is not None:
+            start = end - min(n, self.count)
+        return slice(start, end)
+
+    def last(self, n):
+        """
+        Returns:
+            tuple: (t, raw, value) views of the newest n samples, oldest first.
+        """
+        with self.lock:
+            s = self._window(n)
+        return self.t[s], self.raw[s], self.value[s]
+
+    def since(self, t0):
+        """
+        Returns:
+            tuple: (t, raw, value) views of all samples with timestamp >= t0.
+        """
+        with self.lock:
+            s = self._window(t0=t0)
+        return self.t[s], self.raw[s], self.value[s]
+
+    def stats(self, t0=None, n=None):
+        """
+        Min/max/mean of the engineering value over a window.
+
+        Args:
+            t0 (float): Only samples at or after this timestamp.
+            n (int): Only the newest n samples (used when t0 is None).
+
+        Returns:
+            dict: count, min, max, mean (None when the window is empty, so
+            the result stays valid JSON).
+        """
+        with self.lock:
+            value = self.value[self._window(n, t0)]
+            if len(value) == 0:
+                return dict(EMPTY_STATS)
+            return {"count": len(value), "min": float(value.min()),
+                    "max": float(value.max()), "mean": float(value.mean())}
+
+
+class TelemetryCache:
+    """
+    Per-(APID, channel) ring buffers fed from the receive thread.
+
+    Memory use is bounded by (capacity + 1) * max_channels * 48 bytes; samples for
+    channels beyond max_channels are counted in `rejected` and dropped.
+    """
+
+    def __init__(self, capacity=10000, max_channels=256):
+        self.capacity = capacity
+        self.max_channels = max_channels
+        self.rings = {}  # (apid, channel name) -> ChannelRing
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def ring(self, apid, channel, create=False):
+        key = (apid, channel)
+        ring = self.rings.get(key)
+        if ring is None and create:
+            with self.lock:
+                ring = self.rings.get(key)
+                if ring is None and len(self.rings) < self.max_channels:
+                    ring = self.rings[key] = ChannelRing(self.capacity)
+        return ring
+
+    def append(self, apid, channel, t, raw, value):
+        ring = self.ring(apid, channel, create=True)
+        if ring is None:
+            self.rejected += 1
+            return
+        ring.append(t, raw, value)
+
+    def extend(self, apid, channel, t, raw, value):
+        ring = self.ring(apid, channel, create=True)
+        if ring is None:
+            self.rejected += len(t)
+            return
+        ring.extend(t, raw, value)
+
+    def ingest(self, ccsds_pkt, t=None):
+        """Store every ADC channel of a decoded packet."""
+        self.ingest_channels(ccsds_pkt.header.apid, Telemetery.channels(ccsds_pkt), t)
+
+    def ingest_channels(self, apid, channels, t=None):
+        """Store a (name, raw, value) list, e.g. with derived channels appended."""
+        t = time.time() if t is None else t
+        for name, raw, value in channels:
+            self.append(apid, name, t, raw, value)
+
+    def last(self, apid, channel, n):
+        ring = self.ring(apid, channel)
+        return ring.last(n) if ring else (np.empty(0), np.empty(0, np.int64), np.empty(0))
+
+    def since(self, apid, channel, t0):
+        ring = self.ring(apid, channel)
+        return ring.since(t0) if ring else (np.empty(0), np.empty(0, np.int64), np.empty(0))
+
+    def stats(self, apid, channel, t0=None, n=None):
+        ring = self.ring(apid, channel)
+        if ring is None:
+            return dict(EMPTY_STATS)
+        return ring.stats(t0, n)
+
+    def channels(self):
+        return list(self.rings)
+
+    @property
+    def nbytes(self):
+        return sum(r.nbytes for r in list(self.rings.values()))
@@ -0,0 +1,207 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from tm import CHANNELS
+
+SYNC = (0x55, 0xAA)
+HDR_LEN = 16  # primary + secondary header
+CRC_LEN = 4
+
+# nominal raw readings for the 8 ADC channels decoded by tm.py
+NOMINAL = np.array([0x0601, 0x03E0, 0x038C, 0x039B, 0x03AB, 0x03AC, 0x0A66, 0x0805], dtype=np.float64)
+
+
+def _crc_table():
+    table = np.arange(256, dtype=np.uint32)
+    for _ in range(8):
+        table = np.where(table & 1, (table >> 1) ^ np.uint32(0xEDB88320), table >> 1).astype(np.uint32)
+    return table
+
+
+CRC_TABLE = _crc_table()
+
+
+def crc32_rows(rows):
+    """
+    zlib-compatible CRC32 of every row of a 2-D uint8 array.
+
+    The table-driven loop runs over columns, each step processing all rows
+    at once, so the cost is (row length) NumPy operations regardless of the
+    number of frames.
+    """
+    crc = np.full(rows.shape[0], 0xFFFFFFFF, dtype=np.uint32)
+    for col in range(rows.shape[1]):
+        crc = CRC_TABLE[(crc ^ rows[:, col]) & 0xFF] ^ (crc >> 8)
+    return crc ^ np.uint32(0xFFFFFFFF)
+
+
+def adc_waveforms(count, channels=8, noise=4.0, ramp=0.0, excursion_rate=0.0, seed=None):
+    """
+    Raw ADC payloads for `count` frames.
+
+    Args:
+        count (int): Number of frames.
+        channels (int): ADC words per frame.
+        noise (float): Gaussian noise, standard deviation in counts.
+        ramp (float): Drift in counts per frame, added to every channel.
+        excursion_rate (float): Probability per sample of a jump well outside
+            the tm.py limits (to exercise limit checking).
+        seed (int): Random seed.
+
+    Returns:
+        ndarray: (count, channels) uint16.
+    """
+    rng = np.random.default_rng(seed)
+    nominal = np.resize(NOMINAL, channels)
+    values = nominal + rng.normal(0.0, noise, (count, channels))
+    values += np.arange(count)[:, None] * ramp
+    if excursion_rate:
+        hits = rng.random((count, channels)) < excursion_rate
+        values[hits] *= rng.choice([0.2, 2.5], size=hits.sum())
+    return np.clip(np.rint(values), 0, 0xFFFF).astype(np.uint16)
+
+
+def build_frames(payload, apid=0x123, sequence_start=0, timing_start=None, timing_step=1000,
+                 packet_type=0, function_code=0, segment_number=0, address_code=0):
+    """
+    Build valid TM frames for every row of `payload` in one go.
+
+    Header fields may be scalars or per-frame arrays.
+
+    Args:
+        payload (ndarray): (count, words) uint16 data words.
+        apid: APID(s).
+        sequence_start (int): First 14-bit sequence count.
+        timing_start (int): First time code in µs (default: now).
+        timing_step (int): Time code increment per frame in µs.
+
+    Returns:
+        ndarray: (count, frame length) uint8, each row a complete frame.
+    """
+    count, words = payload.shape
+    length = 2 + HDR_LEN + 2 * words + CRC_LEN
+    frames = np.empty((count, length), dtype=np.uint8)
+    if timing_start is None:
+        timing_start = int(time.time() * 1e6)
+
+    def put16(col, value):
+        value = np.asarray(value, dtype=np.uint32)
+        frames[:, col] = (value >> 8) & 0xFF
+        frames[:, col + 1] = value & 0xFF
+
+    frames[:, 0], frames[:, 1] = SYNC
+    apid = np.asarray(apid, dtype=np.uint32)
+    put16(2, (np.uint32(packet_type) << 12) | (1 << 11) | (apid & 0x7FF))
+    seq = (sequence_start + np.arange(count, dtype=np.uint32)) & 0x3FFF
+    put16(4, (3 << 14) | seq)
+    put16(6, np.full(count, HDR_LEN - 6 + 2 * words + CRC_LEN - 1, dtype=np.uint32))
+    timing = (np.uint64(timing_start) + np.arange(count, dtype=np.uint64) * np.uint64(timing_step))
+    for i in range(6):
+        frames[:, 8 + i] = (timing >> np.uint64(8 * (5 - i))) & np.uint64(0xFF)
+    frames[:, 14] = segment_number
+    frames[:, 15] = function_code
+    put16(16, address_code)
+    frames[:, 18:18 + 2 * words] = payload.astype(">u2").view(np.uint8).reshape(count, 2 * words)
+    crc = crc32_rows(frames[:, 2:-CRC_LEN])
+    frames[:, -CRC_LEN:] = crc.astype(">u4").view(np.uint8).reshape(count, CRC_LEN)
+    return frames
+
+
+def corrupt(frames, flip_rate=0.0, truncate_rate=0.0, junk_rate=0.0, max_junk=16, seed=None):
+    """
+    Serialize frames into one byte stream with injected faults.
+
+    Args:
+        frames (ndarray): (count, length) uint8 from build_frames().
+        flip_rate (float): Probability per frame of one flipped bit.
+        truncate_rate (float): Probability per frame of being cut short.
+        junk_rate (float): Probability per frame of random bytes in front of it.
+        max_junk (int): Maximum junk bytes inserted at once.
+
+    Returns:
+        bytes: The stream.
+    """
+    rng = np.random.default_rng(seed)
+    count, length = frames.shape
+    frames = frames.copy()
+    if flip_rate:
+        rows = np.flatnonzero(rng.random(count) < flip_rate)
+        cols = rng.integers(2, length, rows.size)
+        frames[rows, cols] ^= (1 << rng.integers(0, 8, rows.size)).astype(np.uint8)
+    keep = np.full(count, length)
+    if truncate_rate:
+        cut = rng.random(count) < truncate_rate
+        keep[cut] = rng.integers(1, length, cut.sum())
+    junk_len = np.zeros(count, dtype=np.int64)
+    if junk_rate:
+        hit = rng.random(count) < junk_rate
+        junk_len[hit] = rng.integers(1, max_junk + 1, hit.sum())
+    if not truncate_rate and not junk_rate:
+        return frames.tobytes()
+    junk = rng.integers(0, 256, (count, max_junk), dtype=np.uint8)
+    combined = np.hstack([junk, frames])
+    cols = np.arange(max_junk + length)
+    mask = np.where(cols < max_junk, cols < junk_len[:, None], cols - max_junk < keep[:, None])
+    return combined[mask].tobytes()
+
+
+def generate(count, batch=100000, **options):
+    """Yield byte chunks of `count` frames, `batch` frames at a time."""
+    seq = 0
+    timing = int(time.time() * 1e6)
+    corruption = {k: options.pop(k) for k in ("flip_rate", "truncate_rate", "junk_rate") if k in options}
+    seed = options.pop("seed", None)
+    rng = np.random.default_rng(seed)
+    channels = options.pop("channels", len(CHANNELS))
+    noise = options.pop("noise", 4.0)
+    ramp = options.pop("ramp", 0.0)
+    excursion_rate = options.pop("excursion_rate", 0.0)
+    for start in range(0, count, batch):
+        n = min(batch, count - start)
+        payload = adc_waveforms(n, channels, noise, ramp, excursion_rate, rng.integers(1 << 31))
+        frames = build_frames(payload, sequence_start=seq, timing_start=timing, **options)
+        seq = (seq + n) & 0x3FFF
+        timing += n * options.get("timing_step", 1000)
+        yield corrupt(frames, seed=rng.integers(1 << 31), **corruption)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic CCSDS ADC telemetry for stress tests")
+    parser.add_argument("count", type=int, help="Number of frames")
+    parser.add_argument("--out", default="-", help="Output file, 'pty' for a new pseudo-terminal, '-' to benchmark only")
+    parser.add_argument("--apid", type=lambda s: int(s, 16), default=0x123, help="APID (hex)")
+    parser.add_argument("--noise", type=float, default=4.0, help="ADC noise (counts)")
+    parser.add_argument("--ramp", type=float, default=0.0, help="ADC drift per frame (counts)")
+    parser.add_argument("--excursions", type=float, default=0.0, help="Limit excursion probability per sample")
+    parser.add_argument("--flip", type=float, default=0.0, help="Bit flip probability per frame")
+    parser.add_argument("--truncate", type=float, default=0.0, help="Truncation probability per frame")
+    parser.add_argument("--junk", type=float, default=0.0, help="Junk insertion probability per frame")
+    parser.add_argument("--seed", type=int, help="Random seed")
+    args = parser.parse_args()
+
+    if args.out == "pty":
+        import tty
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        print(f"Writing into pty {os.ttyname(slave)}")
+        write = lambda chunk: os.write(master, chunk)
+    elif args.out == "-":
+        write = lambda chunk: None
+    else:
+        output_file = open(args.out, "wb")
+        write = output_file.write
+
+    t0 = time.perf_counter()
+    total = 0
+    for chunk in generate(args.count, apid=args.apid, noise=args.noise, ramp=args.ramp,
+                          excursion_rate=args.excursions, flip_rate=args.flip, truncate_rate=args.truncate,
+                          junk_rate=args.junk, seed=args.seed):
+        write(chunk)
+        total += len(chunk)
+    elapsed = time.perf_counter() - t0
+    print(f"{args.count} frames, {total} bytes in {elapsed:.3f}s "
+          f"({args.count / elapsed:,.0f} frames/s)", file=sys.stderr)
@@ -0,0 +1,295 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from tm import Telemetery
+
+
+class ChannelStore:
+    """
+    Append-only columnar storage for one calibrated channel.
+
+    Samples are buffered in memory and written as chunks: one .npy file for
+    the timestamps and one for the values. The index records per-chunk
+    count, time range, min/max and sum, so a time-range query only opens
+    the chunks it overlaps, and whole chunks that fall into a single
+    averaging bucket are answered from their statistics alone.
+
+    Each flush appends its chunk's entry to index.log as one JSON line;
+    index.json is only rewritten (and the log emptied) on compaction and
+    close. Opening a store replays the log on top of index.json.
+    """
+
+    def __init__(self, path, chunk_size=4096):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.lock = threading.Lock()
+        self.compact_lock = threading.Lock()  # one compaction at a time
+        self.buf_t = []
+        self.buf_v = []
+        os.makedirs(path, exist_ok=True)
+        self.index_file = os.path.join(path, "index.json")
+        self.log_file = os.path.join(path, "index.log")
+        if os.path.exists(self.index_file):
+            with open(self.index_file, "r") as f:
+                self.index = json.load(f)
+        else:
+            self.index = {"next_id": 0, "chunks": []}
+        self._replay_log()
+
+    def _replay_log(self):
+        if not os.path.exists(self.log_file):
+            return
+        saved_next_id = self.index["next_id"]
+        with open(self.log_file, "r") as f:
+            for line in f:
+                try:
+                    chunk = json.loads(line)
+                except ValueError:
+                    break  # torn last line from a crash; its chunk is not indexed
+                # entries below the saved next_id are already in index.json
+                if chunk["id"] >= saved_next_id:
+                    self.index["chunks"].append(chunk)
+                    self.index["next_id"] = max(self.index["next_id"], chunk["id"] + 1)
+
+    def _chunk_files(self, chunk_id):
+        base = os.path.join(self.path, f"{chunk_id:08d}")
+        return base + ".t.npy", base + ".v.npy"
+
+    def _save_index(self):
+        """Rewrite index.json and empty the log. Call with the lock held."""
+        tmp = self.index_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self.index_file)
+        if os.path.exists(self.log_file):
+            os.remove(self.log_file)
+
+    def _log_chunk(self, chunk):
+        with open(self.log_file, "a") as f:
+            f.write(json.dumps(chunk) + "\n")
+
+    def _write_chunk(self, t, v, chunk_id=None):
+        """
+        Write one chunk and return its index entry. Without a chunk_id a new
+        one is allocated, so the caller must hold the lock.
+        """
+        if chunk_id is None:
+            chunk_id = self.index["next_id"]
+            self.index["next_id"] += 1
+        t_file, v_file = self._chunk_files(chunk_id)
+        np.save(t_file, t)
+        np.save(v_file, v)
+        return {"id": chunk_id, "count": len(t), "t_min": float(t[0]), "t_max": float(t[-1]),
+                "v_min": float(v.min()), "v_max": float(v.max()), "v_sum": float(v.sum())}
+
+    def append(self, t, value):
+        """Append samples; timestamps must not go backwards."""
+        with self.lock:
+            self.buf_t.extend(np.atleast_1d(t).tolist())
+            self.buf_v.extend(np.atleast_1d(value).tolist())
+            if len(self.buf_t) >= self.chunk_size:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if not self.buf_t:
+            return
+        t = np.array(self.buf_t, dtype=np.float64)
+        v = np.array(self.buf_v, dtype=np.float64)
+        self.buf_t, self.buf_v = [], []
+        chunk = self._write_chunk(t, v)
+        self.index["chunks"].append(chunk)
+        self._log_chunk(chunk)
+
+    def close(self):
+        """Flush buffered samples and fold the log into index.json."""
+        with self.lock:
+            self._flush()
+            self._save_index()
+
+    def query(self, t0, t1, bucket=None):
+        """
+        Read samples with t0 <= t <= t1.
+
+        Args:
+            t0 (float): Start time (epoch seconds).
+            t1 (float): End time (epoch seconds).
+            bucket (float): If given, return per-bucket means instead of samples.
+
+        Returns:
+            tuple: (t, value) arrays; with a bucket, t is each bucket's start.
+        """
+        parts_t, parts_v = [], []
+        sums = {}  # bucket number -> [sum, count] from chunk statistics
+        with self.lock:
+            for chunk in self.index["chunks"]:
+                if chunk["t_max"] < t0 or chunk["t_min"] > t1:
+                    continue
+                if (bucket and chunk["t_min"] >= t0 and chunk["t_max"] <= t1 and
+                        (chunk["t_min"] - t0) // bucket == (chunk["t_max"] - t0) // bucket):
+                    acc = sums.setdefault(int((chunk["t_min"] - t0) // bucket), [0.0, 0])
+                    acc[0] += chunk["v_sum"]
+                    acc[1] += chunk["count"]
+                    continue
+                t_file, v_file = self._chunk_files(chunk["id"])
+                t = np.load(t_file, mmap_mode="r")
+                lo, hi = np.searchsorted(t, t0, "left"), np.searchsorted(t, t1, "right")
+                parts_t.append(np.array(t[lo:hi]))
+                parts_v.append(np.array(np.load(v_file, mmap_mode="r")[lo:hi]))
+            if self.buf_t:
+                t = np.array(self.buf_t)
+                mask = (t >= t0) & (t <= t1)
+                parts_t.append(t[mask])
+                parts_v.append(np.array(self.buf_v)[mask])
+
+        t = np.concatenate(parts_t) if parts_t else np.empty(0)
+        v = np.concatenate(parts_v) if parts_v else np.empty(0)
+        if not bucket:
+            return t, v
+
+        nbuckets = int((t1 - t0) // bucket) + 1
+        idx = ((t - t0) // bucket).astype(np.int64)
+        total = np.bincount(idx, weights=v, minlength=nbuckets)
+        count = np.bincount(idx, minlength=nbuckets).astype(np.float64)
+        for b, (s, n) in sums.items():
+            total[b] += s
+            count[b] += n
+        used = count > 0
+        return t0 + np.flatnonzero(used) * bucket, total[used] / count[used]
+
+    def compact(self, min_size=None):
+        """
+        Merge runs of adjacent small chunks into chunks of up to chunk_size.
+
+        The merged chunks are read and written without holding the lock, so
+        append() is never blocked by the merge; the lock is only taken to
+        allocate chunk IDs and to swap in the new index. Chunks flushed in
+        the meantime are appended after the ones that were compacted.
+
+        Returns:
+            int: Number of chunks removed.
+        """
+        min_size = self.chunk_size if min_size is None else min_size
+        with self.compact_lock:
+            with self.lock:
+                chunks = list(self.index["chunks"])
+
+            runs, run = [], []  # runs of small chunks to merge
+            for chunk in chunks:
+                full = run and sum(c["count"] for c in run) + chunk["count"] > self.chunk_size
+                if chunk["count"] >= min_size or full:
+                    if len(run) > 1:
+                        runs.append(run)
+                    run = []
+                if chunk["count"] < min_size:
+                    run.append(chunk)
+            if len(run) > 1:
+                runs.append(run)
+            if not runs:
+                return 0
+
+            with self.lock:
+                first_id = self.index["next_id"]
+                self.index["next_id"] += len(runs)
+            replaced = {}  # id of a run's first chunk -> merged chunk
+            removed = set()
+            for n, run in enumerate(runs):
+                files = [self._chunk_files(c["id"]) for c in run]
+                t = np.concatenate([np.load(tf) for tf, _ in files])
+                v = np.concatenate([np.load(vf) for _, vf in files])
+                replaced[run[0]["id"]] = self._write_chunk(t, v, first_id + n)
+                removed.update(c["id"] for c in run)
+
+            merged = []
+            for chunk in chunks:
+                if chunk["id"] in replaced:
+                    merged.append(replaced[chunk["id"]])
+                elif chunk["id"] not in removed:
+                    merged.append(chunk)
+            with self.lock:
+                self.index["chunks"] = merged + self.index["chunks"][len(chunks):]
+                self._save_index()
+                for chunk_id in removed:
+                    for name in self._chunk_files(chunk_id):
+                        os.remove(name)
+            return len(chunks) - len(merged)
+
+
+class TelemetryStore:
+    """
+    Long-term store of calibrated channels, one ChannelStore per
+    (APID, channel) under root/<APID>/<channel>/.
+    """
+
+    def __init__(self, root, chunk_size=4096):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.channels = {}
+        self.lock = threading.Lock()
+        self._compactor = None
+        self._stop = threading.Event()
+
+    def channel(self, apid, name, create=True):
+        """
+        ChannelStore of a channel. With create=False a channel that has no
+        directory yet gives None instead of being created.
+        """
+        key = (apid, name)
+        store = self.channels.get(key)
+        if store is None:
+            path = os.path.join(self.root, f"{apid:03X}", name)
+            if not create and not os.path.isdir(path):
+                return None
+            with self.lock:
+                store = self.channels.get(key)
+                if store is None:
+                    store = self.channels[key] = ChannelStore(path, self.chunk_size)
+        return store
+
+    def append(self, apid, name, t, value):
+        self.channel(apid, name).append(t, value)
+
+    def ingest(self, ccsds_pkt, t=None):
+        """Store every calibrated ADC channel of a decoded packet."""
+        self.ingest_channels(ccsds_pkt.header.apid, Telemetery.channels(ccsds_pkt), t)
+
+    def ingest_channels(self, apid, channels, t=None):
+        """Store a (name, raw, value) list, e.g. with derived channels appended."""
+        t = time.time() if t is None else t
+        for name, raw, value in channels:
+            self.channel(apid, name).append(t, value)
+
+    def query(self, apid, name, t0, t1, bucket=None):
+        store = self.channel(apid, name, create=False)
+        if store is None:
+            return np.empty(0), np.empty(0)
+        return store.query(t0, t1, bucket)
+
+    def flush(self):
+        for store in list(self.channels.values()):
+            store.flush()
+
+    def compact(self):
+        return sum(store.compact() for store in list(self.channels.values()))
+
+    def start_compaction(self, interval=600.0):
+        """Compact all channels every `interval` seconds on a daemon thread."""
+        def run():
+            while not self._stop.wait(interval):
+                self.compact()
+        self._compactor = threading.Thread(target=run, daemon=True)
+        self._compactor.start()
+
+    def close(self):
+        self._stop.set()
+        if self._compactor:
+            self._compactor.join()
+        for store in list(self.channels.values()):
+            store.close()
@@ -1,9 +1,12 @@
 
+import sys
 import time
 import argparse
 import serial  # Import serial for the standalone function
 from ccsds_pkg import *
 from tm import *
+from router import PacketRouter
+from profiler import add_profile_arguments, profile_from_args
 import struct
 
 
@@ -11,12 +14,26 @@ def parse_arguments():
     parser = argparse.ArgumentParser(description="CCSDS Packet Sender/Receiver")
     parser.add_argument("com_port", help="COM port to use (e.g., COM12)")
     parser.add_argument("file", help="Specify CCSDS packet file")
+    add_profile_arguments(parser)
     return parser.parse_args()
 
 
+def print_telemetry(frame):
+    """Default handler: decode and print the response as ADC telemetry."""
+    ret_ccsds = CCSDS_Packet.from_bytes(frame[2:]) # discard sync word
+
+    print(ret_ccsds)
+    # Serialize to bytes
+    packet_bytes = ret_ccsds.to_bytes()
+    print(f"Serialized Packet (Hex): {' '.join(f'{b:02X}' for b in packet_bytes)}")
+
+    Telemetery.parse(ret_ccsds)
+
+
 if __name__ == "__main__":
 
     args = parse_arguments()
+    profiler = profile_from_args(args)
     print(args)
     print(type(args))
 
@@ -33,6 +50,14 @@ if __name__ == "__main__":
 
     print(packet)
 
+    # Responses are dispatched by (APID, function code); other packet types
+    # register their own handlers here.
+    router = PacketRouter()
+    if profiler:
+        profiler.instrument_print(sys.modules[__name__])
+    handler = profiler.wrap(print_telemetry, "print_telemetry") if profiler else print_telemetry
+    router.register(handler)  # any APID / function code
+
     # Serialize to bytes
     packet_bytes = packet.to_bytes()
     print(f"Serialized Packet (Hex): {' '.join(f'{b:02X}' for b in packet_bytes)}")  
@@ -51,19 +76,12 @@ if __name__ == "__main__":
             output_file.write(response[2:])
 
         if validation:
-          
-            ret_ccsds = CCSDS_Packet.from_bytes(response[2:]) # discard sync word
-            
-            print(ret_ccsds)
-            # Serialize to bytes
-            packet_bytes = ret_ccsds.to_bytes()
-            print(f"Serialized Packet (Hex): {' '.join(f'{b:02X}' for b in packet_bytes)}") 
-
-            Telemetery.parse(ret_ccsds)
+            router.route(bytes(response))
         else:
             if len(response) == 0:
                 print("No response")
-            
+
+    router.close()
 
 
 r"""
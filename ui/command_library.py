@@ -0,0 +1,220 @@
+import collections
+import contextlib
+import io
+import os
+import sys
+import time
+import tkinter as tk
+import zlib
+from tkinter import ttk
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ccsds_pkg import CCSDS_Packet
+from layout import CRC_LEN, FRAME_HEADER_LEN, SECONDARY, SYNC_BYTES
+
+CommandEntry = collections.namedtuple(
+    "CommandEntry", "path name mtime size apid function_code length encoded preview error live_time")
+
+
+def _has_live_time(path):
+    """True if the file asks for the send time ("Timing Info: ?") rather than a fixed value."""
+    with open(path, "r") as f:
+        for line in f:
+            line = line.split("#", 1)[0]
+            if ":" in line:
+                key, value = line.split(":", 1)
+                if key.strip().lower().replace(" ", "_") == "timing_info":
+                    return value.strip() == "?"
+    return False
+
+
+def encode_for_send(entry):
+    """
+    The frame to transmit for an entry.
+
+    A "?" timing info is resolved by from_file() at parse time, so for such
+    entries the cached encoding is re-stamped with the current time (µs,
+    48-bit) and its CRC recomputed; fixed commands are sent as cached.
+    """
+    if not entry.live_time:
+        return entry.encoded
+    header = SECONDARY.decode(entry.encoded, SYNC_BYTES)._replace(timing_info=int(time.time() * 1e6))
+    frame = entry.encoded[:SYNC_BYTES] + SECONDARY.encode_record(header) + entry.encoded[FRAME_HEADER_LEN:-CRC_LEN]
+    return frame + zlib.crc32(frame[SYNC_BYTES:]).to_bytes(CRC_LEN, "big")
+
+
+def parse_command(path, stat=None):
+    """
+    Parse one .sds file into a CommandEntry.
+
+    CCSDS_Packet.from_file() prints while it computes the CRC; that output
+    is swallowed here. A file that fails to parse gives an entry with
+    `error` set and no encoding.
+    """
+    stat = stat or os.stat(path)
+    name = os.path.basename(path)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            packet = CCSDS_Packet.from_file(path)
+            encoded = packet.to_bytes()
+        live_time = _has_live_time(path)
+    except Exception as e:
+        return CommandEntry(path, name, stat.st_mtime_ns, stat.st_size, None, None, 0, None, "", str(e), False)
+    header = packet.header
+    return CommandEntry(path, name, stat.st_mtime_ns, stat.st_size, header.apid, header.function_code,
+                        len(encoded), encoded, str(packet), None, live_time)
+
+
+class CommandLibrary:
+    """
+    Index of the .sds command files in a directory.
+
+    refresh() walks the directory with os.scandir and only re-parses files
+    whose mtime or size changed, so a library of hundreds of commands is
+    parsed once and then kept current for the cost of a directory listing.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.entries = {}  # file name -> CommandEntry
+
+    def refresh(self):
+        """
+        Returns:
+            bool: True if any command was added, changed or removed.
+        """
+        seen = set()
+        changed = False
+        with os.scandir(self.directory) as it:
+            for dir_entry in it:
+                if not dir_entry.name.endswith(".sds") or not dir_entry.is_file():
+                    continue
+                seen.add(dir_entry.name)
+                stat = dir_entry.stat()
+                cached = self.entries.get(dir_entry.name)
+                if cached is None or (cached.mtime, cached.size) != (stat.st_mtime_ns, stat.st_size):
+                    self.entries[dir_entry.name] = parse_command(dir_entry.path, stat)
+                    changed = True
+        for name in set(self.entries) - seen:
+            del self.entries[name]
+            changed = True
+        return changed
+
+    def load(self, path):
+        """Cached entry for any .sds path, inside the library directory or not."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        name = os.path.basename(path)
+        cached = self.entries.get(name)
+        if (cached is not None and cached.path == path and
+                (cached.mtime, cached.size) == (stat.st_mtime_ns, stat.st_size)):
+            return cached
+        entry = parse_command(path, stat)
+        if os.path.dirname(path) == os.path.abspath(self.directory):
+            self.entries[name] = entry
+        return entry
+
+    def find(self, text=""):
+        """
+        Entries whose file name, APID (hex) or function code (hex) contains
+        `text`, sorted by name.
+        """
+        text = text.strip().lower()
+        found = []
+        for entry in sorted(self.entries.values()):
+            if text:
+                keys = [entry.name.lower()]
+                if entry.apid is not None:
+                    keys += [f"0x{entry.apid:03x}", f"{entry.function_code:02x}"]
+                if not any(text in key for key in keys):
+                    continue
+            found.append(entry)
+        return found
+
+
+class CommandBrowser(tk.Frame):
+    """
+    Filterable command list with a parsed preview.
+
+    Double-click or Send transmits the selected command's cached encoding
+    through the `send` callback, without touching the file again. The
+    directory is rescanned every `rescan_ms` milliseconds from Tk's loop,
+    so added, edited and deleted files show up on their own.
+    """
+
+    def __init__(self, parent, library, send, rescan_ms=2000, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.library = library
+        self.send = send
+        self.rescan_ms = rescan_ms
+
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", lambda *args: self.populate())
+        top = tk.Frame(self)
+        top.pack(fill=tk.X, padx=5, pady=2)
+        tk.Label(top, text="Filter:").pack(side=tk.LEFT)
+        tk.Entry(top, textvariable=self.filter_var).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        tk.Button(top, text="Send", command=self.send_selected).pack(side=tk.LEFT, padx=2)
+
+        self.table = ttk.Treeview(self, columns=("apid", "fc", "length"), height=8)
+        self.table.heading("#0", text="Command")
+        self.table.heading("apid", text="APID")
+        self.table.heading("fc", text="FC")
+        self.table.heading("length", text="Bytes")
+        self.table.column("#0", width=140)
+        for col, width in (("apid", 60), ("fc", 40), ("length", 50)):
+            self.table.column(col, width=width, anchor=tk.E)
+        self.table.tag_configure("error", foreground="red")
+        self.table.pack(fill=tk.BOTH, expand=True, padx=5, pady=2)
+        self.table.bind("<<TreeviewSelect>>", lambda e: self.show_preview())
+        self.table.bind("<Double-1>", lambda e: self.send_selected())
+
+        self.preview = tk.Text(self, wrap="word", height=10, state=tk.DISABLED)
+        self.preview.pack(fill=tk.BOTH, expand=True, padx=5, pady=2)
+        self.rescan()
+        if rescan_ms:
+            self.after(rescan_ms, self._auto_rescan)
+
+    def rescan(self):
+        if self.library.refresh():
+            self.populate()
+
+    def _auto_rescan(self):
+        try:
+            self.rescan()
+        except OSError as e:  # directory removed or unreadable; try again later
+            print(f"Command library rescan failed: {e}")
+        self.after(self.rescan_ms, self._auto_rescan)
+
+    def populate(self):
+        selection = self.table.selection()
+        self.table.delete(*self.table.get_children())
+        for entry in self.library.find(self.filter_var.get()):
+            if entry.error:
+                self.table.insert("", tk.END, iid=entry.name, text=entry.name, values=("", "", ""), tags=("error",))
+            else:
+                self.table.insert("", tk.END, iid=entry.name, text=entry.name,
+                                  values=(f"0x{entry.apid:03X}", f"{entry.function_code:02X}", entry.length))
+        kept = [item for item in selection if self.table.exists(item)]
+        if kept:
+            self.table.selection_set(kept)  # a rescan keeps the selection and its preview
+
+    def selected(self):
+        items = self.table.selection()
+        return self.library.entries.get(items[0]) if items else None
+
+    def show_preview(self):
+        entry = self.selected()
+        if entry is None:
+            return
+        text = entry.error and f"Cannot parse {entry.name}: {entry.error}" or (
+            entry.preview + f"\nEncoded: {entry.encoded.hex(' ').upper()}")
+        self.preview.config(state=tk.NORMAL)
+        self.preview.delete("1.0", tk.END)
+        self.preview.insert(tk.END, text)
+        self.preview.config(state=tk.DISABLED)
+
+    def send_selected(self):
+        entry = self.selected()
+        if entry is not None and entry.encoded is not None:
+            self.send(entry)
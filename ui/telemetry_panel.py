@@ -0,0 +1,198 @@
+import collections
+import os
+import queue
+import sys
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ccsds_pkg import CCSDS_Packet, CCSDS_Deframer
+from tm import CHANNELS, Telemetery
+
+UNITS = {name: unit for name, _, _, _, unit in CHANNELS}
+LIMITS = {name: (low, high) for name, _, low, high, _ in CHANNELS}
+
+
+class SerialReceiver(threading.Thread):
+    """
+    Background thread that owns the serial reads, so Tk's mainloop never
+    blocks on the port. Decoded samples go into a bounded queue; when the UI
+    falls behind the oldest samples are dropped and counted.
+
+    The port can be None or fail at any time: the thread then idles until
+    set_port() hands it another one.
+    """
+
+    def __init__(self, ser, maxsize=10000):
+        super().__init__(daemon=True)
+        self.ser = ser
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self.crc_errors = 0
+        self.running = True
+
+    def set_port(self, ser):
+        """Read from `ser` from now on (None: idle until a port is set)."""
+        self.ser = ser
+
+    def run(self):
+        deframer = CCSDS_Deframer()
+        current = None
+        while self.running:
+            ser = self.ser
+            if ser is not current:
+                deframer = CCSDS_Deframer()  # never join bytes from two ports
+                current = ser
+            if ser is None:
+                time.sleep(0.1)
+                continue
+            try:
+                chunk = ser.read(ser.in_waiting or 1)
+            except Exception as e:
+                if ser is self.ser:  # not just the old port closed after a switch
+                    print(f"Serial read error: {e}")
+                    self.ser = None
+                continue
+            for valid, frame in deframer.feed(chunk):
+                if not valid:
+                    self.crc_errors += 1
+                    continue
+                packet = CCSDS_Packet.from_frame(frame)
+                item = (time.time(), packet.header.apid, Telemetery.channels(packet))
+                try:
+                    self.queue.put_nowait(item)
+                except queue.Full:
+                    self.dropped += 1
+                    try:
+                        self.queue.get_nowait()
+                        self.queue.put_nowait(item)
+                    except (queue.Empty, queue.Full):
+                        pass
+
+    def stop(self):
+        self.running = False
+
+
+class TelemetryPanel(tk.Frame):
+    """
+    Live channel table plus a scrolling strip chart.
+
+    The queue is drained with after() at a fixed frame rate. Each frame
+    handles at most max_per_frame samples, updates only the table cells
+    whose text changed and redraws the chart as a single polyline, so the
+    rendering cost per frame stays bounded however fast packets arrive.
+    """
+
+    def __init__(self, parent, rx_queue, fps=20, max_per_frame=2000, history=500, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.rx_queue = rx_queue
+        self.interval = int(1000 / fps)
+        self.max_per_frame = max_per_frame
+        self.rows = {}       # (apid, name) -> Treeview item id
+        self.shown = {}      # (apid, name) -> (raw text, value text) currently displayed
+        self.selected = None
+        self.history = collections.deque(maxlen=history)
+        self.packets = 0
+        self.rate_count = 0
+        self.rate_time = time.monotonic()
+
+        self.table = ttk.Treeview(self, columns=("raw", "value", "unit"), height=10)
+        self.table.heading("#0", text="Channel")
+        self.table.heading("raw", text="Raw")
+        self.table.heading("value", text="Value")
+        self.table.heading("unit", text="Unit")
+        self.table.column("#0", width=110)
+        for col, width in (("raw", 70), ("value", 90), ("unit", 50)):
+            self.table.column(col, width=width, anchor=tk.E)
+        self.table.tag_configure("alarm", foreground="red")
+        self.table.pack(fill=tk.X, padx=5, pady=5)
+        self.table.bind("<<TreeviewSelect>>", self._on_select)
+
+        self.chart = tk.Canvas(self, height=150, bg="black")
+        self.chart.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.trace = self.chart.create_line(0, 0, 0, 0, fill="lime")
+        self.chart_label = self.chart.create_text(5, 5, anchor=tk.NW, fill="white", text="Select a channel")
+
+        self.status = tk.Label(self, anchor=tk.W, text="Waiting for telemetry...")
+        self.status.pack(fill=tk.X, padx=5)
+
+        self.after(self.interval, self._tick)
+
+    def clear(self):
+        self.table.delete(*self.table.get_children())
+        self.rows.clear()
+        self.shown.clear()
+        self.history.clear()
+        self.selected = None
+        self.chart.coords(self.trace, 0, 0, 0, 0)
+        self.chart.itemconfigure(self.chart_label, text="Select a channel")
+
+    def _on_select(self, event):
+        items = self.table.selection()
+        keys = [k for k, item in self.rows.items() if item in items]
+        if keys and keys[0] != self.selected:
+            self.selected = keys[0]
+            self.history.clear()
+            apid, name = self.selected
+            self.chart.itemconfigure(self.chart_label, text=f"0x{apid:03X} {name}")
+
+    def _tick(self):
+        latest = {}
+        for _ in range(self.max_per_frame):
+            try:
+                t, apid, channels = self.rx_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.packets += 1
+            self.rate_count += 1
+            for name, raw, value in channels:
+                latest[(apid, name)] = (raw, value)
+                if (apid, name) == self.selected:
+                    self.history.append(value)
+        if latest:
+            self._update_table(latest)
+            if self.selected in latest:
+                self._draw_chart()
+        self._update_status()
+        self.after(self.interval, self._tick)
+
+    def _update_table(self, latest):
+        for key, (raw, value) in latest.items():
+            text = (f"0x{raw:04X}", f"{value:.3f}")
+            if self.shown.get(key) == text:
+                continue
+            apid, name = key
+            low, high = LIMITS.get(name, (None, None))
+            tags = ("alarm",) if low is not None and not low <= value <= high else ()
+            item = self.rows.get(key)
+            if item is None:
+                item = self.rows[key] = self.table.insert("", tk.END, text=f"0x{apid:03X} {name}",
+                                                          values=(*text, UNITS.get(name, "")), tags=tags)
+            else:
+                self.table.item(item, values=(*text, UNITS.get(name, "")), tags=tags)
+            self.shown[key] = text
+
+    def _draw_chart(self):
+        if len(self.history) < 2:
+            return
+        width = max(self.chart.winfo_width(), 2)
+        height = max(self.chart.winfo_height(), 2)
+        lo, hi = min(self.history), max(self.history)
+        span = (hi - lo) or 1.0
+        step = width / (self.history.maxlen - 1)
+        points = []
+        for i, v in enumerate(self.history):
+            points.append(i * step)
+            points.append(height - 5 - (v - lo) / span * (height - 20))
+        self.chart.coords(self.trace, *points)
+
+    def _update_status(self):
+        now = time.monotonic()
+        if now - self.rate_time >= 1.0:
+            rate = self.rate_count / (now - self.rate_time)
+            self.status.config(text=f"{self.packets} packets, {rate:.0f} packets/s, "
+                                    f"{self.rx_queue.qsize()} queued")
+            self.rate_count = 0
+            self.rate_time = now
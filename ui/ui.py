@@ -4,10 +4,14 @@ import os  # Import os to list files in the directory
 from tkinter import ttk, messagebox
 import serial.tools.list_ports
 import serial
+from telemetry_panel import SerialReceiver, TelemetryPanel
+from command_library import CommandLibrary, CommandBrowser, encode_for_send
 
 # Global variable to store the selected COM port
 selected_com_port = None
 ser = None  # Serial connection object
+root = None  # main window, created after the first port selection
+receiver = None  # SerialReceiver, switched to each newly opened port
 
 # Function to ask the user to select a COM port
 def select_com_port():
@@ -18,10 +22,12 @@ def select_com_port():
 
     if not ports:
         messagebox.showwarning("COM Port", "No COM ports detected! Plug in a device and restart.")
-        exit()  # Exit the application if no COM port is found
+        if root is None:
+            exit()  # Exit the application if no COM port is found at startup
+        return
 
     # Create a selection window
-    port_window = tk.Tk()
+    port_window = tk.Tk() if root is None else tk.Toplevel(root)
     port_window.title("Select COM Port")
     port_window.geometry("300x150")
     port_window.resizable(False, False)
@@ -41,29 +47,53 @@ def select_com_port():
 
         # Try opening the COM port
         try:
-            ser = serial.Serial(selected_com_port, baudrate=9600, timeout=1)
-            messagebox.showinfo("COM Port", f"Connected to {selected_com_port}")
+            new_ser = serial.Serial(selected_com_port, baudrate=9600, timeout=1)
         except Exception as e:
             messagebox.showerror("COM Port", f"Failed to connect: {str(e)}")
             select_com_port()  # Retry selection if connection fails
+            return
+        old_ser, ser = ser, new_ser
+        if receiver is not None:
+            receiver.set_port(ser)  # (re)start live telemetry on the new port
+        if old_ser is not None:
+            old_ser.close()
+        messagebox.showinfo("COM Port", f"Connected to {selected_com_port}")
 
     # OK Button
     tk.Button(port_window, text="OK", command=confirm_selection).pack(pady=10)
 
-    port_window.mainloop()  # Run the window
+    if root is None:
+        port_window.mainloop()  # Run the window
+    else:
+        port_window.grab_set()
+
+
+# Parsed .sds files of the working directory, rescanned incrementally
+command_library = CommandLibrary(os.getcwd())
 
+# Send an encoded command straight from the library cache
+def send_command(entry):
+    if ser is None or not ser.is_open:
+        messagebox.showerror("Send", "No COM port open.")
+        return
+    try:
+        ser.write(encode_for_send(entry))  # re-stamps "Timing Info: ?" commands
+    except Exception as e:
+        messagebox.showerror("Send", f"Failed to send {entry.name}: {str(e)}")
 
 # Function to list all .sds files and update the Edit menu
 def update_edit_menu():
     edit_menu.delete(0, tk.END)  # Clear previous entries
-    current_directory = os.getcwd()
-    sds_files = [f for f in os.listdir(current_directory) if f.endswith(".sds")]
+    if command_library.refresh():
+        command_browser.populate()
+    entries = command_library.find()
 
-    if not sds_files:
+    if not entries:
         edit_menu.add_command(label="No .sds files found", state=tk.DISABLED)
     else:
-        for file in sds_files:
-            edit_menu.add_command(label=file, command=lambda f=file: open_edit_window(f))
+        for entry in entries:
+            label = entry.name if entry.error else f"{entry.name}  (APID 0x{entry.apid:03X}, FC {entry.function_code:02X})"
+            edit_menu.add_command(label=label, command=lambda f=entry.name: open_edit_window(f))
 
 # Function to open an edit window for the selected file
 def open_edit_window(filename):
@@ -93,8 +123,13 @@ def open_edit_window(filename):
                 messagebox.showerror("Error", f"Failed to save file: {str(e)}")
 
     def send_file():
-        """Simulate sending the file."""
-        messagebox.showinfo("Send File", f"File '{filename}' is being sent...")
+        """Save, then send the file's encoding (re-parsed only if it changed)."""
+        save_file()
+        entry = command_library.load(filename)
+        if entry.error:
+            messagebox.showerror("Send File", f"Cannot parse '{filename}': {entry.error}")
+        else:
+            send_command(entry)
 
     # Create a new window for editing
     edit_window = tk.Toplevel(root)
@@ -135,17 +170,18 @@ def select_ccsds_file():
 
     if file_path:
         try:
-            with open(file_path, "r") as file:
-                content = file.read()
-
-            # Update the text widget in Panel 1 to display file content
-            panel1_text.config(state=tk.NORMAL)
-            panel1_text.delete("1.0", tk.END)
-            panel1_text.insert(tk.END, content)
-            panel1_text.config(state=tk.DISABLED)
-
+            entry = command_library.load(file_path)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open file: {str(e)}")
+            return
+        if entry.error:
+            messagebox.showerror("Error", f"Failed to parse file: {entry.error}")
+            return
+        send_command(entry)
+        if command_library.refresh():
+            command_browser.populate()
+        if command_library.entries.get(entry.name) is entry:
+            command_browser.table.selection_set(entry.name)  # shows the parsed preview
 
 # Function to handle menu actions for Panel 2 (Telemetry)
 def panel2_action(action):
@@ -180,6 +216,7 @@ panel1_menu_button.pack(side=tk.LEFT, padx=5, pady=2)
 
 # Create a dropdown menu for "TeleCommand"
 panel1_menu = Menu(panel1_menu_button, tearoff=0)
+panel1_menu.add_command(label="Select COM port", command=select_com_port)
 panel1_menu.add_command(label="Send a CCSDS file", command=select_ccsds_file)
 panel1_menu.add_command(label="Send a CCSDS file periodically", command=lambda: messagebox.showinfo("TeleCommand", "Periodic file sending started."))
 
@@ -197,9 +234,9 @@ panel1_edit_button["menu"] = edit_menu
 # Update the file list when clicking "Edit"
 panel1_edit_button.bind("<ButtonPress>", lambda e: update_edit_menu())
 
-# Create a Text widget to display the selected file content
-panel1_text = tk.Text(panel1, wrap="word", state=tk.DISABLED, height=15, width=40)
-panel1_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+# Filterable command list with parsed preview; double-click sends
+command_browser = CommandBrowser(panel1, command_library, send_command)
+command_browser.pack(fill=tk.BOTH, expand=True)
 
 ### === PANEL 2 (Telemetry) === ###
 panel2 = tk.Frame(paned_window, bg="lightgreen")
@@ -216,7 +253,7 @@ panel2_menu_button.pack(side=tk.LEFT, padx=5, pady=2)
 # Create a dropdown menu for "Telemetry"
 panel2_menu = Menu(panel2_menu_button, tearoff=0)
 panel2_menu.add_command(label="View Logs", command=lambda: panel2_action("View Logs"))
-panel2_menu.add_command(label="Clear Logs", command=lambda: panel2_action("Clear Logs"))
+panel2_menu.add_command(label="Clear Logs", command=lambda: telemetry_panel.clear())
 
 # Attach the menu to the button
 panel2_menu_button["menu"] = panel2_menu
@@ -225,5 +262,13 @@ panel2_menu_button["menu"] = panel2_menu
 panel2_view_button = tk.Menubutton(panel2_menu_frame, text="View", font=("Arial", 12, "bold"), relief=tk.RAISED, bg="gray", fg="white")
 panel2_view_button.pack(side=tk.LEFT, padx=5, pady=2)
 
+# Live telemetry: frames are received on a background thread and drawn by
+# the panel from Tk's own loop. ser is None if no port was opened; the
+# receiver then idles until one is selected from the TeleCommand menu.
+receiver = SerialReceiver(ser)
+telemetry_panel = TelemetryPanel(panel2, receiver.queue)
+telemetry_panel.pack(fill=tk.BOTH, expand=True)
+receiver.start()
+
 # Run the application
 root.mainloop()